@@ -0,0 +1,176 @@
+import argparse
+import itertools
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from incremental import portfolio_keys
+from indicators import (
+    MIN_VOTES, RSI_OVERBOUGHT, RSI_OVERSOLD, align_panel, compact_panel, compute_indicators,
+)
+from market_data import resolve_symbol
+from portfolio_engine import default_store
+
+
+# Forward return horizons in trading days
+HORIZONS = (5, 20, 60)
+TRADING_DAYS_PER_YEAR = 252
+
+# Position codes used throughout the backtest
+SIGNAL_CODES = {'SELL': -1, 'HOLD': 0, 'BUY': 1}
+
+STATS_COLUMNS = [
+    'Signal', 'Horizon', 'Bars', 'Mean Return', 'Excess Return', 'Hit Rate', 'Entries per Ticker-Year',
+]
+
+
+# ==================
+# VOTES
+# ==================
+class VoteComponents:
+    # The parts of the 3-of-4 vote that do not depend on the swept thresholds
+    # (MACD crossover, price vs MA50, OBV momentum) are counted once. Only the RSI
+    # vote is re-evaluated per parameter set. Every array is in the compact panel
+    # layout, so row t-1 is the previous bar of the same ticker.
+    def __init__(self, close, volume):
+        panels = compute_indicators(close, volume)
+        _, self.order = compact_panel(close)
+
+        def compact(name):
+            return np.take_along_axis(panels[name].to_numpy(), self.order, axis=0)
+
+        price, ma50, obv_momentum = compact('Current Price'), compact('MA50'), compact('OBV Momentum')
+        macd, signal = compact('MACD'), compact('MACD Signal')
+
+        self.close = price
+        self.valid = ~np.isnan(price)
+        self.rsi = compact('RSI')
+        self.buy_base = (macd > signal).astype(np.int8) + (price > ma50) + (obv_momentum > 0)
+        self.sell_base = (macd < signal).astype(np.int8) + (price < ma50) + (obv_momentum < 0)
+
+    # Position per bar: 1 BUY, -1 SELL, 0 HOLD, same precedence as score_recommendations
+    def positions(self, rsi_oversold=RSI_OVERSOLD, rsi_overbought=RSI_OVERBOUGHT, min_votes=MIN_VOTES):
+        buy = self.buy_base + (self.rsi < rsi_oversold) >= min_votes
+        sell = self.sell_base + (self.rsi > rsi_overbought) >= min_votes
+        return np.where(buy, 1, np.where(sell, -1, 0)).astype(np.int8)
+
+
+# Return from each bar's close to the close `horizon` bars later, per ticker
+def forward_returns(close, horizons=HORIZONS):
+    returns = {}
+    for horizon in horizons:
+        later = np.full_like(close, np.nan)
+        later[:-horizon] = close[horizon:]
+        returns[horizon] = later / close - 1
+    return returns
+
+
+# ==================
+# STATISTICS
+# ==================
+# Forward return, hit rate and turnover per signal. Hit rate is the share of BUY
+# bars followed by a gain and of SELL bars followed by a loss; HOLD has none.
+# Turnover counts how often a ticker switches into the signal per year.
+def signal_stats(positions, forward, valid):
+    codes = positions.astype(np.int64) + 1
+    observed = valid.sum()
+
+    previous_valid = np.zeros_like(valid)
+    previous_valid[1:] = valid[:-1]
+    entered = valid & previous_valid
+    entered[1:] &= positions[1:] != positions[:-1]
+    entries = np.bincount(codes[entered], minlength=3)
+
+    rows = []
+    for horizon, returns in forward.items():
+        scored = valid & ~np.isnan(returns)
+        bars = np.bincount(codes[scored], minlength=3)
+        totals = np.bincount(codes[scored], weights=returns[scored], minlength=3)
+        gains = np.bincount(codes[scored], weights=returns[scored] > 0, minlength=3)
+        losses = np.bincount(codes[scored], weights=returns[scored] < 0, minlength=3)
+        baseline = returns[scored].mean() if scored.any() else np.nan
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = totals / bars
+            hit_rates = {'BUY': gains[2] / bars[2], 'SELL': losses[0] / bars[0], 'HOLD': np.nan}
+        for signal, code in SIGNAL_CODES.items():
+            rows.append({
+                'Signal': signal,
+                'Horizon': horizon,
+                'Bars': int(bars[code + 1]),
+                'Mean Return': means[code + 1],
+                'Excess Return': means[code + 1] - baseline,
+                'Hit Rate': hit_rates[signal],
+                'Entries per Ticker-Year': entries[code + 1] / observed * TRADING_DAYS_PER_YEAR if observed else np.nan,
+            })
+    return pd.DataFrame(rows, columns=STATS_COLUMNS)
+
+
+# ==================
+# BACKTEST
+# ==================
+# Evaluate the scoring rule on every date for every ticker of the (dates x tickers)
+# close/volume panels and summarize what followed each signal
+def backtest(close, volume, rsi_oversold=RSI_OVERSOLD, rsi_overbought=RSI_OVERBOUGHT,
+             min_votes=MIN_VOTES, horizons=HORIZONS):
+    votes = VoteComponents(close, volume)
+    forward = forward_returns(votes.close, horizons)
+    return signal_stats(votes.positions(rsi_oversold, rsi_overbought, min_votes), forward, votes.valid)
+
+
+# Backtest every combination of thresholds. Indicators and forward returns are
+# computed once; each grid point only re-scores the votes.
+def sweep(close, volume, oversold_grid=(20, 25, 30, 35, 40), overbought_grid=(60, 65, 70, 75, 80),
+          votes_grid=(2, 3, 4), horizons=HORIZONS):
+    votes = VoteComponents(close, volume)
+    forward = forward_returns(votes.close, horizons)
+
+    frames = []
+    for oversold, overbought, min_votes in itertools.product(oversold_grid, overbought_grid, votes_grid):
+        stats = signal_stats(votes.positions(oversold, overbought, min_votes), forward, votes.valid)
+        stats.insert(0, 'Min Votes', min_votes)
+        stats.insert(0, 'RSI Overbought', overbought)
+        stats.insert(0, 'RSI Oversold', oversold)
+        frames.append(stats)
+    return pd.concat(frames, ignore_index=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest the BUY/SELL/HOLD scoring rule over 5 years of history.")
+    parser.add_argument("universe", help="CSV with 'Ticker' and 'Exchange' columns")
+    parser.add_argument("--horizons", type=int, nargs="+", default=list(HORIZONS), help="Forward return horizons in bars")
+    parser.add_argument("--sweep", action="store_true", help="Sweep the RSI thresholds and vote count over a grid")
+    parser.add_argument("--top", type=int, default=10, help="Parameter sets to show when sweeping")
+    parser.add_argument("--output", "-o", help="Write the full statistics table to this CSV")
+    args = parser.parse_args(argv)
+
+    universe = pd.read_csv(args.universe)
+    if 'Ticker' not in universe.columns or 'Exchange' not in universe.columns:
+        parser.error("universe CSV must have 'Ticker' and 'Exchange' columns")
+
+    symbols = [s for s in (resolve_symbol(t, e) for t, e in portfolio_keys(universe)) if s]
+    histories = default_store().histories(symbols)
+    close, volume = align_panel(histories, 'Close'), align_panel(histories, 'Volume')
+    if close.empty:
+        parser.error("no price history for any ticker in the universe")
+
+    started = time.monotonic()
+    if args.sweep:
+        stats = sweep(close, volume, horizons=args.horizons)
+        # Rank parameter sets by how much BUY signals beat the average bar at the longest horizon
+        buys = stats[(stats['Signal'] == 'BUY') & (stats['Horizon'] == max(args.horizons))]
+        print(buys.sort_values('Excess Return', ascending=False).head(args.top).to_string(index=False))
+    else:
+        stats = backtest(close, volume, horizons=args.horizons)
+        print(stats.to_string(index=False))
+    print(f"Backtested {close.shape[1]} tickers x {close.shape[0]} dates in {time.monotonic() - started:.2f}s",
+          file=sys.stderr)
+
+    if args.output:
+        stats.to_csv(args.output, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from chart_patterns import PATTERN_SCANNERS, PatternFeatures, detect_all_patterns, detect_chart_pattern
+from indicators import align_panel, compute_indicators, latest_indicators, score_recommendations
+from pattern_scan import pattern_series, scan_patterns
+from portfolio_engine import add_risk_columns, analyze_rows, results_table
+from prefilter import screen_patterns
+from synthetic_data import SIZES, generate_ohlcv, generate_universe
+
+
+DEFAULT_BASELINE = "benchmark_baseline.json"
+DEFAULT_REPEAT = 5
+
+# Symbols in the indicator panel and in the stubbed portfolio
+DEFAULT_SYMBOLS = 50
+
+# A case regresses when its median exceeds baseline * threshold, and by more
+# than MIN_SLOWDOWN seconds so sub-millisecond cases don't flag on timer noise
+DEFAULT_THRESHOLD = 1.25
+MIN_SLOWDOWN = 0.001
+
+# Seeds used for the injected-pattern correctness check
+CHECK_SEEDS = range(10)
+
+# Injected patterns the detector is known to miss. The Symmetrical Triangle
+# scanner's breakout rule can never be met, so every planted triangle is
+# reported but does not fail the run; misses of any other pattern do.
+KNOWN_MISSES = {'Symmetrical Triangle'}
+
+
+# ==================
+# STUBBED DATA SOURCE
+# ==================
+class SyntheticStore:
+    # Same interface as portfolio_engine.DataStore, serving generated histories
+    # from memory so the pipeline is timed without disk or network.
+    columnar = None
+
+    def __init__(self, histories):
+        self._histories = histories
+        self._infos = {symbol: {'longName': symbol, 'trailingPE': 20.0} for symbol in histories}
+
+    def histories(self, symbols):
+        return {symbol: self._histories[symbol] for symbol in symbols if symbol in self._histories}
+
+    def fundamentals(self, symbols):
+        return {symbol: self._infos.get(symbol, {}) for symbol in symbols}
+
+    def fetch_errors(self, symbols):
+        return {}
+
+
+# ==================
+# CASES
+# ==================
+# Benchmark cases as {name: zero-argument callable}
+def pattern_cases(size, seed=0):
+    n, kind = SIZES[size]
+    history, _ = generate_ohlcv(n, kind, seed=seed)
+    close, volume = history['Close'], history['Volume']
+    features = PatternFeatures(close, volume)
+
+    cases = {f"features/{size}": lambda: PatternFeatures(close, volume)}
+    for name, scan in PATTERN_SCANNERS:
+        # Exhaust the scanner so every occurrence is found, not just the first
+        cases[f"detect.{name}/{size}"] = lambda scan=scan: list(scan(features))
+    cases[f"detect_chart_pattern/{size}"] = lambda: detect_chart_pattern(close, volume)
+    cases[f"detect_all_patterns/{size}"] = lambda: detect_all_patterns(close, volume)
+    return cases
+
+
+def indicator_cases(size, symbols=DEFAULT_SYMBOLS, seed=0):
+    n, kind = SIZES[size]
+    histories, _ = generate_universe(symbols, n, kind, seed=seed)
+    close, volume = align_panel(histories, 'Close'), align_panel(histories, 'Volume')
+
+    def scoring():
+        latest = latest_indicators(close, volume)
+        return score_recommendations(
+            latest['RSI'], latest['MACD'], latest['MACD Signal'],
+            latest['Current Price'], latest['MA50'], latest['OBV Momentum'],
+        )
+
+    return {
+        f"indicators/{size}x{symbols}": lambda: compute_indicators(close, volume),
+        f"scoring/{size}x{symbols}": scoring,
+    }
+
+
+# Screening and the serial pattern scan, with and without the prefilter, over a
+# universe of plain random walks (most symbols in a real screen show no pattern)
+def scan_cases(size, symbols=DEFAULT_SYMBOLS, seed=0):
+    n, kind = SIZES[size]
+    histories, _ = generate_universe(symbols, n, kind, seed=seed, patterns=[])
+    series = pattern_series(histories)
+    return {
+        f"prefilter/{size}x{symbols}": lambda: screen_patterns(series),
+        f"scan_patterns/{size}x{symbols}": lambda: scan_patterns(series, max_workers=1, prefilter=False),
+        f"scan_patterns+prefilter/{size}x{symbols}": lambda: scan_patterns(series, max_workers=1),
+    }
+
+
+# The full per-portfolio analysis on 5y of daily bars per holding
+def pipeline_cases(symbols=DEFAULT_SYMBOLS, seed=0):
+    n, kind = SIZES['5y']
+    histories, _ = generate_universe(symbols, n, kind, seed=seed)
+    store = SyntheticStore(histories)
+    keys = [(symbol.rsplit('.', 1)[0], 'NSE') for symbol in histories]
+
+    def pipeline():
+        results = analyze_rows(keys, store)
+        row_results = [results[key] for key in keys]
+        return add_risk_columns(results_table(row_results), row_results, store)
+
+    return {f"pipeline/{symbols}": pipeline}
+
+
+# ==================
+# TIMING
+# ==================
+# One warm-up call, then `repeat` timed calls. Returns seconds per call.
+def time_case(fn, repeat=DEFAULT_REPEAT):
+    fn()
+    timings = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - began)
+    return timings
+
+
+def run_benchmarks(cases, repeat=DEFAULT_REPEAT, progress=None):
+    results = {}
+    for name, fn in cases.items():
+        timings = time_case(fn, repeat)
+        results[name] = {'median': statistics.median(timings), 'min': min(timings)}
+        if progress is not None:
+            progress(name, results[name])
+    return results
+
+
+# ==================
+# BASELINES
+# ==================
+def environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+    }
+
+
+def save_baseline(path, results, repeat):
+    with open(path, 'w') as f:
+        json.dump({'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'repeat': repeat,
+                   'environment': environment(), 'cases': results}, f, indent=2)
+
+
+def load_baseline(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+# Compare medians against a baseline. Cases missing from either side are
+# reported with NaN and never count as regressions.
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    previous = baseline.get('cases', {})
+    rows = []
+    for name, result in results.items():
+        before = previous.get(name, {}).get('median', np.nan)
+        ratio = result['median'] / before if before else np.nan
+        regressed = bool(ratio > threshold and result['median'] - before > MIN_SLOWDOWN)
+        rows.append({'Case': name, 'Baseline (ms)': before * 1000, 'Median (ms)': result['median'] * 1000,
+                     'Ratio': ratio, 'Regressed': regressed})
+    return pd.DataFrame(rows, columns=['Case', 'Baseline (ms)', 'Median (ms)', 'Ratio', 'Regressed'])
+
+
+# ==================
+# CORRECTNESS
+# ==================
+# Every injected pattern must be reported by detect_all_patterns with an
+# occurrence overlapping the bars it was planted on. Misses are reported as they
+# are: the symmetrical triangle detector wants a last close 2% beyond the
+# window's own high/low, which that close is part of, so planted triangles
+# currently show up as misses.
+def check_injected(sizes, seeds=CHECK_SEEDS):
+    rows = []
+    for size in sizes:
+        n, kind = SIZES[size]
+        for seed in seeds:
+            history, injected = generate_ohlcv(n, kind, seed=seed)
+            matches = detect_all_patterns(history['Close'], history['Volume'])
+            for pattern in injected:
+                detected = any(m.name == pattern.name and m.start <= pattern.end and m.end >= pattern.start
+                               for m in matches)
+                rows.append({'Size': size, 'Seed': seed, 'Pattern': pattern.name,
+                             'Start': pattern.start, 'End': pattern.end, 'Detected': detected})
+    return pd.DataFrame(rows, columns=['Size', 'Seed', 'Pattern', 'Start', 'End', 'Detected'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the indicator, pattern and pipeline code on synthetic prices.")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES), help="Series sizes to run")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed calls per case")
+    parser.add_argument("--symbols", type=int, default=DEFAULT_SYMBOLS, help="Symbols in the indicator panel and portfolio")
+    parser.add_argument("--only", help="Run only cases whose name contains this text")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Write this run's timings as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Fail when a case's median exceeds baseline x threshold")
+    parser.add_argument("--skip-check", action="store_true", help="Skip the injected-pattern correctness check")
+    args = parser.parse_args(argv)
+
+    failed = False
+    if not args.skip_check:
+        check = check_injected(args.sizes)
+        missed = check[~check['Detected']]
+        known = missed['Pattern'].isin(KNOWN_MISSES)
+        print(f"Injected patterns detected: {len(check) - len(missed)}/{len(check)}", file=sys.stderr)
+        if known.any():
+            print(f"Known misses ({', '.join(sorted(set(missed.loc[known, 'Pattern'])))}): {known.sum()}",
+                  file=sys.stderr)
+        if not known.all():
+            print(missed[~known].to_string(index=False), file=sys.stderr)
+            failed = True
+
+    cases = {}
+    for size in args.sizes:
+        cases.update(pattern_cases(size))
+        cases.update(indicator_cases(size, args.symbols))
+        cases.update(scan_cases(size, args.symbols))
+    cases.update(pipeline_cases(args.symbols))
+    if args.only:
+        cases = {name: fn for name, fn in cases.items() if args.only in name}
+
+    results = run_benchmarks(cases, args.repeat, progress=lambda name, result: print(
+        f"{name:<50} {result['median'] * 1000:10.2f} ms (min {result['min'] * 1000:.2f})", file=sys.stderr))
+
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        comparison = compare(results, load_baseline(args.baseline), args.threshold)
+        print(comparison.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+        regressed = comparison[comparison['Regressed']]
+        if not regressed.empty:
+            print(f"{len(regressed)} case(s) slower than {args.threshold:.2f}x baseline: "
+                  f"{', '.join(regressed['Case'])}", file=sys.stderr)
+            failed = True
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results, args.repeat)
+        print(f"Saved baseline for {len(results)} cases to {args.baseline}", file=sys.stderr)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
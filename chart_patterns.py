@@ -1,137 +1,97 @@
+from collections import namedtuple
+
 import numpy as np
 import pandas as pd
 from scipy.signal import find_peaks, argrelextrema
 import matplotlib.pyplot as plt
 
+import fast_patterns
+from profiling import profiler
+
 
 # Helper function to calculate swing amplitude
 def calculate_swing_amplitude(highs, lows):
     return [highs[i] - lows[i] for i in range(len(highs))]
 
 
-# ========================
-# HEAD & SHOULDERS PATTERN
-# ========================
-def detect_head_and_shoulders(prices, volumes=None):
-    peaks, _ = find_peaks(prices)
-    valleys, _ = find_peaks(-prices)
+# A detected pattern occurrence: bar positions where it starts and is confirmed,
+# plus a 0-1 confidence describing how comfortably the rules were met
+PatternMatch = namedtuple("PatternMatch", ["name", "recommendation", "start", "end", "confidence"])
 
-    if len(peaks) < 3 or len(valleys) < 2:
-        return False
 
-    for i in range(len(peaks) - 2):
-        l, h, r = peaks[i], peaks[i + 1], peaks[i + 2]
+# Helper function to average rule margins into a 0-1 confidence
+def _confidence(*scores):
+    return float(np.clip(np.mean(scores), 0.0, 1.0))
 
-        # Shoulder symmetry (within 3%)
-        shoulder_diff = abs(prices.iloc[l] - prices.iloc[r]) / max(prices.iloc[l], prices.iloc[r])
-        if shoulder_diff > 0.03:
-            continue
 
-        # Head prominence (at least 10% higher)
-        if prices.iloc[h] < prices.iloc[l] * 1.10 or prices.iloc[h] < prices.iloc[r] * 1.10:
-            continue
+# ========================
+# SHARED SERIES FEATURES
+# ========================
+class PatternFeatures:
+    # Everything the detectors need, extracted once per price series: raw ndarray
+    # views, peaks and valleys with their prominences, and the 5-bar rolling
+    # extrema used by the triangle rules. Detectors work on positions, so the
+    # original index of `prices` (e.g. dates) does not matter.
+    def __init__(self, prices, volumes=None, rolling_window=5):
+        self.prices = np.asarray(prices, dtype=float).ravel()
+        self.volumes = None if volumes is None else np.asarray(volumes, dtype=float).ravel()
+        self.series = pd.Series(self.prices)
 
-        # Peak spacing (3-20 periods)
-        if not (3 < h - l < 20 and 3 < r - h < 20):
-            continue
+        self.peaks, peak_props = find_peaks(self.prices, prominence=(None, None))
+        self.valleys, valley_props = find_peaks(-self.prices, prominence=(None, None))
+        self.peak_prominences = peak_props['prominences']
+        self.valley_prominences = valley_props['prominences']
 
-        # Find valleys between peaks
-        left_valleys = [v for v in valleys if l < v < h]
-        right_valleys = [v for v in valleys if h < v < r]
+        self.rolling_highs = self.series.rolling(window=rolling_window, min_periods=1).max().to_numpy()
+        self.rolling_lows = self.series.rolling(window=rolling_window, min_periods=1).min().to_numpy()
+        self.mean_price = self.series.mean()
 
-        if not left_valleys or not right_valleys:
-            continue
+    def __len__(self):
+        return len(self.prices)
 
-        valley1 = min(left_valleys, key=lambda v: prices.iloc[v])
-        valley2 = min(right_valleys, key=lambda v: prices.iloc[v])
 
-        # Neckline validation
-        neckline_slope = (prices.iloc[valley2] - prices.iloc[valley1]) / (valley2 - valley1)
-        neckline_func = lambda idx: prices.iloc[valley1] + neckline_slope * (idx - valley1)
+# Helper function so every detector accepts either a price series or prebuilt features
+def _features(prices, volumes=None):
+    if isinstance(prices, PatternFeatures):
+        return prices
+    return PatternFeatures(prices, volumes)
 
-        # Volume surge at head (if volume data available)
-        if volumes is not None:
-            head_volume = volumes.iloc[h]
-            avg_volume = volumes.iloc[l:r + 1].mean()
-            if head_volume < avg_volume * 1.5:  # Require 50% volume surge
-                continue
 
-        # Neckline breakout confirmation
-        breakout_window = prices.iloc[r + 1:r + 10]
-        if not any(prices.iloc[r + 1 + i] < neckline_func(r + 1 + i) for i in range(len(breakout_window))):
-            continue
+# ========================
+# HEAD & SHOULDERS PATTERN
+# ========================
+def _scan_head_and_shoulders(f):
+    m = fast_patterns.head_and_shoulders(f.prices, f.volumes, f.peaks, f.valleys)
+    for l, breakout, shoulder_diff, head_ratio in zip(m['left'], m['breakout'], m['shoulder_diff'], m['head_ratio']):
+        yield l, breakout, _confidence(1 - shoulder_diff / 0.03, (head_ratio - 1) / 0.2)
 
-        return True
 
-    return False
+def detect_head_and_shoulders(prices, volumes=None):
+    return next(_scan_head_and_shoulders(_features(prices, volumes)), None) is not None
 
 
 # =================================
 # INVERTED HEAD & SHOULDERS PATTERN
 # =================================
-def detect_inverted_head_and_shoulders(prices, volumes=None):
-    valleys, _ = find_peaks(-prices)
-    peaks, _ = find_peaks(prices)
-
-    if len(valleys) < 3 or len(peaks) < 2:
-        return False
-
-    for i in range(len(valleys) - 2):
-        l, h, r = valleys[i], valleys[i + 1], valleys[i + 2]
-
-        # Shoulder symmetry
-        shoulder_diff = abs(prices.iloc[l] - prices.iloc[r]) / max(prices.iloc[l], prices.iloc[r])
-        if shoulder_diff > 0.03:
-            continue
-
-        # Head prominence (at least 10% lower)
-        if prices.iloc[h] > prices.iloc[l] * 0.90 or prices.iloc[h] > prices.iloc[r] * 0.90:
-            continue
-
-        # Valley spacing (3-20 periods)
-        if not (3 < h - l < 20 and 3 < r - h < 20):
-            continue
-
-        # Find peaks between valleys
-        left_peaks = [p for p in peaks if l < p < h]
-        right_peaks = [p for p in peaks if h < p < r]
-
-        if not left_peaks or not right_peaks:
-            continue
-
-        peak1 = max(left_peaks, key=lambda p: prices.iloc[p])
-        peak2 = max(right_peaks, key=lambda p: prices.iloc[p])
-
-        # Neckline validation
-        neckline_slope = (prices.iloc[peak2] - prices.iloc[peak1]) / (peak2 - peak1)
-        neckline_func = lambda idx: prices.iloc[peak1] + neckline_slope * (idx - peak1)
-
-        # Volume surge at head
-        if volumes is not None:
-            head_volume = volumes.iloc[h]
-            avg_volume = volumes.iloc[l:r + 1].mean()
-            if head_volume < avg_volume * 1.5:
-                continue
-
-        # Neckline breakout confirmation
-        breakout_window = prices.iloc[r + 1:r + 10]
-        if not any(prices.iloc[idx] > neckline_func(idx) for idx in breakout_window.index):
-            continue
+def _scan_inverted_head_and_shoulders(f):
+    m = fast_patterns.inverted_head_and_shoulders(f.prices, f.volumes, f.peaks, f.valleys)
+    for l, breakout, shoulder_diff, head_ratio in zip(m['left'], m['breakout'], m['shoulder_diff'], m['head_ratio']):
+        yield l, breakout, _confidence(1 - shoulder_diff / 0.03, (1 - head_ratio) / 0.2)
 
-        return True
 
-    return False
+def detect_inverted_head_and_shoulders(prices, volumes=None):
+    return next(_scan_inverted_head_and_shoulders(_features(prices, volumes)), None) is not None
 
 
 # ================
 # DOUBLE TOP/BOTTOM
 # ================
-def validate_double_pattern(extrema, prices, is_top=True, min_periods=10, symmetry_threshold=0.4):
+def _scan_double_pattern(extrema, prices, min_periods=10, symmetry_threshold=0.4):
     for i in range(len(extrema) - 1):
         e1, e2 = extrema[i], extrema[i + 1]
 
         # Price similarity (within 3%)
-        price_diff = abs(prices.iloc[e1] - prices.iloc[e2]) / prices.iloc[e1]
+        price_diff = abs(prices[e1] - prices[e2]) / prices[e1]
         if price_diff > 0.03:
             continue
 
@@ -147,44 +107,53 @@ def validate_double_pattern(extrema, prices, is_top=True, min_periods=10, symmet
         if symmetry_ratio < symmetry_threshold:
             continue
 
-        return True
+        yield e1, e2, _confidence(1 - price_diff / 0.03, symmetry_ratio)
+
+
+def validate_double_pattern(extrema, prices, is_top=True, min_periods=10, symmetry_threshold=0.4):
+    prices = prices.prices if isinstance(prices, PatternFeatures) else np.asarray(prices, dtype=float)
+    return next(_scan_double_pattern(extrema, prices, min_periods, symmetry_threshold), None) is not None
 
-    return False
+
+def _scan_double_top(f):
+    if len(f.peaks) < 2:
+        return iter(())
+    return _scan_double_pattern(f.peaks, f.prices)
+
+
+def _scan_double_bottom(f):
+    if len(f.valleys) < 2:
+        return iter(())
+    return _scan_double_pattern(f.valleys, f.prices)
 
 
 def detect_double_top(prices):
-    peaks, _ = find_peaks(prices)
-    if len(peaks) < 2:
-        return False
-    return validate_double_pattern(peaks, prices, is_top=True)
+    return next(_scan_double_top(_features(prices)), None) is not None
 
 
 def detect_double_bottom(prices):
-    valleys, _ = find_peaks(-prices)
-    if len(valleys) < 2:
-        return False
-    return validate_double_pattern(valleys, prices, is_top=False)
+    return next(_scan_double_bottom(_features(prices)), None) is not None
 
 
 # =================
 # TRIPLE TOP/BOTTOM
 # =================
-def detect_triple_top(prices):
-    peaks, _ = find_peaks(prices)
-    if len(peaks) < 3:
-        return False
+def _scan_triple_pattern(extrema, prices):
+    if len(extrema) < 3:
+        return
 
-    for i in range(len(peaks) - 2):
-        p1, p2, p3 = peaks[i], peaks[i + 1], peaks[i + 2]
+    for i in range(len(extrema) - 2):
+        e1, e2, e3 = extrema[i], extrema[i + 1], extrema[i + 2]
 
         # Price similarity
-        if (abs(prices.iloc[p1] - prices.iloc[p2]) / prices.iloc[p1] > 0.03 or
-                abs(prices.iloc[p2] - prices.iloc[p3]) / prices.iloc[p2] > 0.03):
+        diff1 = abs(prices[e1] - prices[e2]) / prices[e1]
+        diff2 = abs(prices[e2] - prices[e3]) / prices[e2]
+        if diff1 > 0.03 or diff2 > 0.03:
             continue
 
         # Time symmetry validation
-        duration1 = p2 - p1
-        duration2 = p3 - p2
+        duration1 = e2 - e1
+        duration2 = e3 - e2
         symmetry_ratio = min(duration1, duration2) / max(duration1, duration2)
         if symmetry_ratio < 0.4:  # 40% symmetry threshold
             continue
@@ -193,127 +162,103 @@ def detect_triple_top(prices):
         if duration1 < 10 or duration2 < 10:
             continue
 
-        return True
+        yield e1, e3, _confidence(1 - max(diff1, diff2) / 0.03, symmetry_ratio)
 
-    return False
 
+def _scan_triple_top(f):
+    return _scan_triple_pattern(f.peaks, f.prices)
 
-def detect_triple_bottom(prices):
-    valleys, _ = find_peaks(-prices)
-    if len(valleys) < 3:
-        return False
-
-    for i in range(len(valleys) - 2):
-        v1, v2, v3 = valleys[i], valleys[i + 1], valleys[i + 2]
 
-        # Price similarity
-        if (abs(prices.iloc[v1] - prices.iloc[v2]) / prices.iloc[v1] > 0.03 or
-                abs(prices.iloc[v2] - prices.iloc[v3]) / prices.iloc[v2] > 0.03):
-            continue
+def _scan_triple_bottom(f):
+    return _scan_triple_pattern(f.valleys, f.prices)
 
-        # Time symmetry validation
-        duration1 = v2 - v1
-        duration2 = v3 - v2
-        symmetry_ratio = min(duration1, duration2) / max(duration1, duration2)
-        if symmetry_ratio < 0.4:
-            continue
 
-        # Minimum duration requirement
-        if duration1 < 10 or duration2 < 10:
-            continue
+def detect_triple_top(prices):
+    return next(_scan_triple_top(_features(prices)), None) is not None
 
-        return True
 
-    return False
+def detect_triple_bottom(prices):
+    return next(_scan_triple_bottom(_features(prices)), None) is not None
 
 
 # =============
 # CUP AND HANDLE
 # =============
-def detect_cup_and_handle(prices, volumes=None, window=30, handle_window=10):
-    for i in range(window, len(prices) - handle_window - 1):
-        left_max = prices.iloc[i - window:i].max()
-        cup_min = prices.iloc[i - window:i + 1].min()
-        right_max = prices.iloc[i + 1:i + 1 + window].max()
-
-        # Cup depth validation (30-50% retracement)
-        retracement = (left_max - cup_min) / left_max
-        if not (0.3 <= retracement <= 0.5):
-            continue
+# `at` restricts the scan to a single cup bottom position
+def _scan_cup_and_handle(f, window=30, handle_window=10, at=None):
+    if at is None:
+        m = fast_patterns.cup_and_handle(f.prices, f.volumes, window, handle_window)
+    else:
+        m = fast_patterns.cup_and_handle_at(f.prices, f.volumes, at, window, handle_window)
+    for start, end, retracement, handle_position in zip(m['start'], m['end'], m['retracement'], m['handle_position']):
+        yield start, end, _confidence(1 - abs(retracement - 0.4) / 0.1, handle_position)
 
-        # Handle should form in upper half of cup
-        cup_midpoint = (left_max + cup_min) / 2
-        handle_prices = prices.iloc[i + 1:i + 1 + handle_window]
-        if handle_prices.min() < cup_midpoint:
-            continue
 
-        # Volume dry-up in handle (if volume available)
-        if volumes is not None:
-            cup_volume = volumes.iloc[i - window:i + 1].mean()
-            handle_volume = volumes.iloc[i + 1:i + 1 + handle_window].mean()
-            if handle_volume > cup_volume * 0.8:  # Require at least 20% volume reduction
-                continue
+def detect_cup_and_handle(prices, volumes=None, window=30, handle_window=10):
+    return next(_scan_cup_and_handle(_features(prices, volumes), window, handle_window), None) is not None
 
-        return True
 
-    return False
+# Every qualifying cup bottom position, not just whether one exists
+def find_cup_and_handle(prices, volumes=None, window=30, handle_window=10):
+    f = _features(prices, volumes)
+    return fast_patterns.cup_and_handle(f.prices, f.volumes, window, handle_window)['cup']
 
 
 # =================
 # TRIANGLE PATTERNS
 # =================
-def validate_triangle(prices, min_touch_points=5):
-    prices = pd.Series(prices).reset_index(drop=True)
-    highs = prices.rolling(window=5, min_periods=1).max().reset_index(drop=True)
-    lows = prices.rolling(window=5, min_periods=1).min().reset_index(drop=True)
-
-    peaks, _ = find_peaks(prices)
-    valleys, _ = find_peaks(-prices)
+def _scan_triangle(f, min_touch_points=5):
+    prices, peaks, valleys = f.prices, f.peaks, f.valleys
 
     # Only use peaks/valleys within the valid range of highs/lows
-    resistance_touches = [p for p in peaks if p < len(highs) and abs(prices.iloc[p] - highs.iloc[p]) < 0.01 * prices.mean()]
-    support_touches = [v for v in valleys if v < len(lows) and abs(prices.iloc[v] - lows.iloc[v]) < 0.01 * prices.mean()]
+    tolerance = 0.01 * f.mean_price
+    resistance_touches = peaks[np.abs(prices[peaks] - f.rolling_highs[peaks]) < tolerance]
+    support_touches = valleys[np.abs(prices[valleys] - f.rolling_lows[valleys]) < tolerance]
 
     if len(resistance_touches) + len(support_touches) < min_touch_points:
-        return False
+        return
 
     if len(peaks) < 3 or len(valleys) < 3:
-        return False
+        return
 
-    swing_amps = []
-    for i in range(min(len(peaks), len(valleys))):
-        if peaks[i] > valleys[i]:
-            swing_amps.append(prices.iloc[peaks[i]] - prices.iloc[valleys[i]])
+    pairs = min(len(peaks), len(valleys))
+    swinging = peaks[:pairs] > valleys[:pairs]
+    swing_amps = prices[peaks[:pairs][swinging]] - prices[valleys[:pairs][swinging]]
 
     if len(swing_amps) < 3:
-        return False
+        return
 
     contraction_ratio = swing_amps[-1] / swing_amps[0]
     if contraction_ratio > 0.8:
-        return False
+        return
 
-    return len(support_touches) >= 2
+    if len(support_touches) >= 2:
+        start = min(peaks[0], valleys[0])
+        yield start, len(prices) - 1, _confidence(1 - contraction_ratio / 0.8, len(support_touches) / min_touch_points)
 
 
-def detect_symmetrical_triangle(prices):
-    if not validate_triangle(prices):
-        return False
+def validate_triangle(prices, min_touch_points=5):
+    return next(_scan_triangle(_features(prices), min_touch_points), None) is not None
 
-    # Breakout direction confirmation
-    if len(prices) < 30:
-        return False
 
-    # Look for breakout in either direction
-    high = prices.max()
-    low = prices.min()
-    mid = (high + low) / 2
-    last_price = prices.iloc[-1]
+def _scan_symmetrical_triangle(f):
+    for start, end, confidence in _scan_triangle(f):
+        # Breakout direction confirmation
+        if len(f) < 30:
+            return
 
-    # Breakout confirmation
-    if last_price > high * 1.02 or last_price < low * 0.98:
-        return True
+        # Look for breakout in either direction
+        high = f.series.max()
+        low = f.series.min()
+        last_price = f.prices[-1]
 
-    return False
+        # Breakout confirmation
+        if last_price > high * 1.02 or last_price < low * 0.98:
+            yield start, end, confidence
+
+
+def detect_symmetrical_triangle(prices):
+    return next(_scan_symmetrical_triangle(_features(prices)), None) is not None
 
 
 # ===================
@@ -331,21 +276,45 @@ PATTERN_RECOMMENDATIONS = {
     "Symmetrical Triangle": "hold",  # or "buy"/"sell" if you want to infer direction
 }
 
-def detect_chart_pattern(prices, volumes=None):
-    patterns = [
-        ("Cup and Handle", lambda: detect_cup_and_handle(prices, volumes)),
-        ("Head & Shoulders", lambda: detect_head_and_shoulders(prices, volumes)),
-        ("Inverted Head & Shoulders", lambda: detect_inverted_head_and_shoulders(prices, volumes)),
-        ("Double Top", lambda: detect_double_top(prices)),
-        ("Double Bottom", lambda: detect_double_bottom(prices)),
-        ("Triple Top", lambda: detect_triple_top(prices)),
-        ("Triple Bottom", lambda: detect_triple_bottom(prices)),
-        ("Symmetrical Triangle", lambda: detect_symmetrical_triangle(prices)),
-    ]
-
-    for name, detector in patterns:
-        if detector():
+# Detectors in priority order. Volume only feeds the detectors that use it,
+# matching the original detect_* signatures.
+PATTERN_SCANNERS = [
+    ("Cup and Handle", _scan_cup_and_handle),
+    ("Head & Shoulders", _scan_head_and_shoulders),
+    ("Inverted Head & Shoulders", _scan_inverted_head_and_shoulders),
+    ("Double Top", _scan_double_top),
+    ("Double Bottom", _scan_double_bottom),
+    ("Triple Top", _scan_triple_top),
+    ("Triple Bottom", _scan_triple_bottom),
+    ("Symmetrical Triangle", _scan_symmetrical_triangle),
+]
+
+
+# Evaluate every pattern on one shared feature set and return all hits
+def detect_all_patterns(prices, volumes=None):
+    f = _features(prices, volumes)
+    matches = []
+    for name, scan in PATTERN_SCANNERS:
+        with profiler.span(f"detect.{name}"):
+            found = list(scan(f))
+        for start, end, confidence in found:
+            matches.append(PatternMatch(name, PATTERN_RECOMMENDATIONS.get(name, "hold"), int(start), int(end), confidence))
+    return matches
+
+
+# `candidates` optionally limits the scan to the named patterns, e.g. the ones
+# that survived prefilter.screen_patterns
+def detect_chart_pattern(prices, volumes=None, candidates=None):
+    with profiler.span("detect.features"):
+        f = _features(prices, volumes)
+
+    for name, scan in PATTERN_SCANNERS:
+        if candidates is not None and name not in candidates:
+            continue
+        with profiler.span(f"detect.{name}"):
+            found = next(scan(f), None) is not None
+        if found:
             recommendation = PATTERN_RECOMMENDATIONS.get(name, "hold")
             return name, recommendation
 
-    return "No clear pattern", "hold"
\ No newline at end of file
+    return "No clear pattern", "hold"
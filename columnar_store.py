@@ -0,0 +1,441 @@
+import json
+import os
+import shutil
+import threading
+import time
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from price_cache import CACHE_DIR
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single server process is assumed
+    fcntl = None
+
+
+COLUMNAR_DIR = os.path.join(CACHE_DIR, "columnar")
+
+# On-disk dtype per OHLCV field. Prices are float32 (about 7 significant digits,
+# plenty for rupee prices); volume is int64 with missing values stored as 0.
+FIELDS = {
+    'Open': np.float32,
+    'High': np.float32,
+    'Low': np.float32,
+    'Close': np.float32,
+    'Volume': np.int64,
+}
+DTYPES = {field: np.dtype(dtype) for field, dtype in {**FIELDS, 'Date': 'datetime64[s]'}.items()}
+
+# Spare rows reserved after each symbol, so daily bars are written in place
+# (about three months of sessions) before the symbol has to be moved
+SLACK_ROWS = 64
+
+# Rewrite the store into a fresh generation once its files hold this many
+# times the rows that live symbols reserve
+COMPACT_RATIO = 2
+
+# Zero-copy views of one symbol's rows
+PriceView = namedtuple("PriceView", ["dates", "open", "high", "low", "close", "volume"])
+
+# What a store has mapped: the generation, its published index file, the index
+# of symbol -> (offset, length, end) and the field arrays. Replaced as a whole,
+# so a reader that takes it once sees an index and arrays that belong together.
+Snapshot = namedtuple("Snapshot", ["generation", "index_name", "index", "arrays"])
+EMPTY_SNAPSHOT = Snapshot(None, None, {}, {})
+
+
+# Dates are stored as exchange-local, timezone-naive seconds
+def _naive_dates(index):
+    return index.tz_localize(None) if index.tz is not None else index
+
+
+# A history as one array per stored field, in the on-disk dtypes
+def _columns(history):
+    columns = {'Date': _naive_dates(history.index).to_numpy(dtype='datetime64[s]')}
+    for field, dtype in FIELDS.items():
+        column = history[field] if field in history else pd.Series(np.nan, index=history.index)
+        if field == 'Volume':
+            column = column.fillna(0)
+        columns[field] = column.to_numpy(dtype=dtype)
+    return columns
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class MappedBuffers:
+    # Same shape as pattern_scan.PriceBuffers, pointing at the store's own files.
+    # Holds a pin on their generation until cleaned up, so the files are not
+    # pruned while worker processes still have to open them.
+    def __init__(self, store, generation, layout):
+        self.close_path = store._field_path(generation, 'Close')
+        self.volume_path = store._field_path(generation, 'Volume')
+        self.layout = layout
+        self._release = lambda: store._unpin(generation)
+
+    def cleanup(self):
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cleanup()
+
+
+class ColumnarPriceStore:
+    # Every symbol's daily bars packed into one .npy file per field, plus an
+    # index of symbol -> (offset, length, end). Files are memory-mapped
+    # read-only, so all sessions and worker processes share one copy through the
+    # page cache.
+    #
+    # Rows a published index refers to are never rewritten. New bars go into the
+    # spare rows between a symbol's length and its `end`; a symbol that no longer
+    # fits (or whose stored bars were revised) is appended at the end of the
+    # files. Each publish writes a new index and atomically repoints CURRENT, so
+    # views taken before it stay valid. Once the files are mostly stale rows, the
+    # live symbols are compacted into a new generation directory. Processes pin
+    # the generation they map (a pid file under readers/), and a generation is
+    # only deleted when it is neither current nor pinned by a live process.
+    def __init__(self, root=COLUMNAR_DIR):
+        self.root = root
+        self.snapshot = EMPTY_SNAPSHOT
+        self._lock = threading.RLock()
+        self._file_locked = 0
+        self._pins = Counter()
+        os.makedirs(root, exist_ok=True)
+        self.refresh()
+
+    def _current_path(self):
+        return os.path.join(self.root, "CURRENT")
+
+    def _field_path(self, generation, field):
+        return os.path.join(self.root, generation, f"{field.lower()}.npy")
+
+    def _read_current(self):
+        try:
+            with open(self._current_path()) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    # Cross-process lock on the store: exclusive while publishing, shared while
+    # mapping a new generation, so a generation can't be pruned between a
+    # reader finding it in CURRENT and pinning it. Taken with self._lock held;
+    # nested calls (refresh inside publish) reuse the outer lock.
+    @contextmanager
+    def _file_lock(self, exclusive):
+        if fcntl is None or self._file_locked:
+            yield
+            return
+        with open(os.path.join(self.root, "LOCK"), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            self._file_locked += 1
+            try:
+                yield
+            finally:
+                self._file_locked -= 1
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    # Map the latest published index, remapping the files only when it moved to
+    # another generation or refers to rows appended since they were mapped
+    def refresh(self):
+        current = self._read_current()
+        if current is None or current == self._current():
+            return
+        with self._lock, self._file_lock(exclusive=False):
+            current = self._read_current()
+            generation, _, index_name = current.partition('/')
+            with open(os.path.join(self.root, generation, index_name or "index.json")) as f:
+                index = {symbol: (entry[0], entry[1], entry[2] if len(entry) > 2 else entry[0] + entry[1])
+                         for symbol, entry in json.load(f).items()}
+
+            previous = self.snapshot
+            rows = max((end for _, _, end in index.values()), default=0)
+            if generation != previous.generation or rows > len(previous.arrays['Date']):
+                arrays = {field: np.load(self._field_path(generation, field), mmap_mode='r') for field in DTYPES}
+                self._pin(generation)
+            else:
+                arrays = previous.arrays
+            self.snapshot = Snapshot(generation, index_name, index, arrays)
+            if arrays is not previous.arrays and previous.generation is not None:
+                self._unpin(previous.generation)
+
+    def _current(self):
+        snapshot = self.snapshot
+        if snapshot.generation is None:
+            return None
+        return f"{snapshot.generation}/{snapshot.index_name}" if snapshot.index_name else snapshot.generation
+
+    def __contains__(self, symbol):
+        return symbol in self.snapshot.index
+
+    def symbols(self):
+        return list(self.snapshot.index)
+
+    # ==================
+    # PINS
+    # ==================
+    def _pin_path(self, generation):
+        return os.path.join(self.root, generation, "readers", str(os.getpid()))
+
+    def _pin(self, generation):
+        with self._lock:
+            self._pins[generation] += 1
+            if self._pins[generation] == 1:
+                os.makedirs(os.path.dirname(self._pin_path(generation)), exist_ok=True)
+                open(self._pin_path(generation), 'w').close()
+
+    def _unpin(self, generation):
+        with self._lock:
+            self._pins[generation] -= 1
+            if self._pins[generation] > 0:
+                return
+            del self._pins[generation]
+            try:
+                os.remove(self._pin_path(generation))
+            except OSError:
+                pass
+
+    # Whether any live process (this one included) still pins `generation`.
+    # Pins left behind by processes that died are removed.
+    def _pinned(self, generation):
+        readers = os.path.join(self.root, generation, "readers")
+        pinned = False
+        for name in os.listdir(readers) if os.path.isdir(readers) else []:
+            pid = int(name) if name.isdigit() else None
+            if pid == os.getpid():
+                pinned = pinned or self._pins[generation] > 0
+            elif pid is not None and _alive(pid):
+                pinned = True
+            else:
+                try:
+                    os.remove(os.path.join(readers, name))
+                except OSError:
+                    pass
+        return pinned
+
+    # ==================
+    # READS
+    # ==================
+    # Reads go through one snapshot (the current one unless given), so a
+    # concurrent refresh can't pair an index with another mapping's arrays
+    def view(self, symbol, snapshot=None):
+        snapshot = self.snapshot if snapshot is None else snapshot
+        offset, length, _ = snapshot.index[symbol]
+        rows = slice(offset, offset + length)
+        a = snapshot.arrays
+        return PriceView(a['Date'][rows], a['Open'][rows], a['High'][rows], a['Low'][rows], a['Close'][rows], a['Volume'][rows])
+
+    # An OHLCV DataFrame whose columns and index are views of the mapped files
+    def frame(self, symbol, snapshot=None):
+        view = self.view(symbol, snapshot)
+        return pd.DataFrame(
+            {'Open': view.open, 'High': view.high, 'Low': view.low, 'Close': view.close, 'Volume': view.volume},
+            index=pd.DatetimeIndex(view.dates, copy=False, name='Date'),
+            copy=False,
+        )
+
+    def histories(self, symbols):
+        self.refresh()
+        snapshot = self.snapshot
+        return {symbol: self.frame(symbol, snapshot) for symbol in dict.fromkeys(symbols) if symbol in snapshot.index}
+
+    # Worker-side layout for frames served by this store (e.g. their 1y tails),
+    # located by where their Close column points into the mapped file. Frames
+    # from another mapping or not from the store are left out. The caller cleans
+    # up the returned MappedBuffers once the workers are done with them.
+    def pattern_buffers(self, frames):
+        with self._lock:
+            snapshot = self.snapshot
+            if snapshot.generation is None:
+                return None
+            base = snapshot.arrays['Close']
+            start = base.__array_interface__['data'][0]
+            itemsize = base.itemsize
+            layout = {}
+            for symbol, frame in frames.items():
+                if frame is None or frame.empty:
+                    continue
+                close = frame['Close'].to_numpy()
+                address = close.__array_interface__['data'][0]
+                if close.dtype != base.dtype or not start <= address < start + base.nbytes:
+                    continue
+                layout[symbol] = ((address - start) // itemsize, len(close), True)
+            self._pin(snapshot.generation)
+            return MappedBuffers(self, snapshot.generation, layout)
+
+    # ==================
+    # PUBLISHING
+    # ==================
+    def _unchanged(self, symbol, history):
+        snapshot = self.snapshot
+        if symbol not in snapshot.index:
+            return False
+        offset, length, _ = snapshot.index[symbol]
+        last = offset + length - 1
+        return (length == len(history)
+                and snapshot.arrays['Date'][last] == _naive_dates(history.index)[-1].to_datetime64()
+                and snapshot.arrays['Close'][last] == np.float32(history['Close'].iloc[-1]))
+
+    # Where `columns` can be written over a symbol's stored rows without
+    # touching any row a published index refers to: the stored bars it still
+    # has must match exactly (a rolled-off head just moves the offset) and the
+    # new bars must fit in the spare rows. Returns (offset, first new row) or None.
+    def _patch(self, symbol, columns):
+        snapshot = self.snapshot
+        if symbol not in snapshot.index:
+            return None
+        offset, length, end = snapshot.index[symbol]
+        dates = snapshot.arrays['Date'][offset:offset + length]
+        dropped = int(np.searchsorted(dates, columns['Date'][0]))
+        kept = length - dropped
+        if kept <= 0 or kept > len(columns['Date']) or offset + len(columns['Date']) + dropped > end:
+            return None
+        for field, values in columns.items():
+            stored = snapshot.arrays[field][offset + dropped:offset + length]
+            if not np.array_equal(stored, values[:kept], equal_nan=values.dtype.kind == 'f'):
+                return None
+        return offset + dropped, kept
+
+    # Write the new rows of every changed symbol into the current generation's
+    # files. Returns the new index, or None when the files would hold more than
+    # COMPACT_RATIO times the live rows and should be compacted instead.
+    def _append(self, changed):
+        snapshot = self.snapshot
+        index = dict(snapshot.index)
+        rows = len(snapshot.arrays['Date'])
+        writes = []
+        for symbol, columns in changed.items():
+            length = len(columns['Date'])
+            patch = self._patch(symbol, columns)
+            if patch is not None:
+                offset, kept = patch
+                index[symbol] = (offset, length, snapshot.index[symbol][2])
+                writes.append((offset + kept, {field: values[kept:] for field, values in columns.items()}))
+            else:
+                index[symbol] = (rows, length, rows + length + SLACK_ROWS)
+                writes.append((rows, columns))
+                rows += length + SLACK_ROWS
+
+        live = sum(end - offset for offset, _, end in index.values())
+        if rows > COMPACT_RATIO * live:
+            return None
+
+        for field, dtype in DTYPES.items():
+            path = self._field_path(snapshot.generation, field)
+            with open(path, 'r+b') as f:
+                version = np.lib.format.read_magic(f)
+                if version == (1, 0):
+                    read_header, write_header = np.lib.format.read_array_header_1_0, np.lib.format.write_array_header_1_0
+                else:
+                    read_header, write_header = np.lib.format.read_array_header_2_0, np.lib.format.write_array_header_2_0
+                read_header(f)
+                header = f.tell()
+                for position, columns in writes:
+                    f.seek(header + position * dtype.itemsize)
+                    f.write(np.ascontiguousarray(columns[field], dtype=dtype).tobytes())
+                f.truncate(header + rows * dtype.itemsize)
+                # numpy pads the header so the row count can grow in place
+                f.seek(0)
+                write_header(f, {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': (rows,)})
+                if f.tell() != header:
+                    raise RuntimeError(f"Header of {path} changed size")
+        return index
+
+    # Pack every live symbol, with spare rows, into a new generation directory
+    def _compact(self, changed):
+        snapshot = self.snapshot
+        order = [s for s in snapshot.index if s not in changed] + list(changed)
+        lengths = {s: len(changed[s]['Date']) if s in changed else snapshot.index[s][1] for s in order}
+        total = sum(lengths.values()) + SLACK_ROWS * len(order)
+
+        generation = f"gen-{time.time_ns()}-{os.getpid()}"
+        os.makedirs(os.path.join(self.root, generation))
+        out = {field: np.lib.format.open_memmap(self._field_path(generation, field), mode='w+',
+                                                dtype=dtype, shape=(total,))
+               for field, dtype in DTYPES.items()}
+
+        index = {}
+        offset = 0
+        for symbol in order:
+            length = lengths[symbol]
+            rows = slice(offset, offset + length)
+            if symbol in changed:
+                for field, values in changed[symbol].items():
+                    out[field][rows] = values
+            else:
+                old_offset = snapshot.index[symbol][0]
+                for field in DTYPES:
+                    out[field][rows] = snapshot.arrays[field][old_offset:old_offset + length]
+            index[symbol] = (offset, length, offset + length + SLACK_ROWS)
+            offset += length + SLACK_ROWS
+
+        for array in out.values():
+            array.flush()
+        del out
+        return generation, index
+
+    # Store `histories` (symbol -> OHLCV DataFrame), keeping every other symbol
+    # already stored. Only changed symbols are written; publishing is skipped
+    # if nothing changed.
+    def publish(self, histories):
+        with self._lock, self._file_lock(exclusive=True):
+            self.refresh()
+            snapshot = self.snapshot
+            changed = {}
+            for symbol, history in histories.items():
+                if history is None or history.empty:
+                    continue
+                history = history.dropna(subset=['Close'])
+                history = history[~history.index.duplicated(keep='last')].sort_index()
+                if not history.empty and not self._unchanged(symbol, history):
+                    changed[symbol] = _columns(history)
+            if not changed:
+                return snapshot.generation
+
+            index = self._append(changed) if snapshot.generation is not None else None
+            generation = snapshot.generation
+            if index is None:
+                generation, index = self._compact(changed)
+
+            index_name = f"index-{time.time_ns()}.json"
+            with open(os.path.join(self.root, generation, index_name), 'w') as f:
+                json.dump(index, f)
+            tmp_path = f"{self._current_path()}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(f"{generation}/{index_name}")
+            os.replace(tmp_path, self._current_path())
+            self.refresh()
+            self._prune()
+            return generation
+
+    # Delete generations that are neither current nor pinned, and superseded
+    # index files of the current one (already loaded by whoever read them).
+    # Processes that still map a deleted generation keep their views (the files
+    # stay alive until unmapped); removal failures are ignored.
+    def _prune(self):
+        snapshot = self.snapshot
+        for name in os.listdir(self.root):
+            if name.startswith("gen-") and name != snapshot.generation and not self._pinned(name):
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+        directory = os.path.join(self.root, snapshot.generation)
+        for name in os.listdir(directory):
+            if name.startswith("index") and name.endswith(".json") and name != snapshot.index_name:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
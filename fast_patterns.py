@@ -0,0 +1,199 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+from scipy.signal import find_peaks
+
+
+# NumPy pattern engine: the same rules as chart_patterns.py, evaluated for every
+# candidate at once on plain ndarrays. Inputs are positional arrays; outputs are
+# arrays of candidate positions in scan order, so callers can take the first hit
+# or all of them.
+
+BREAKOUT_BARS = 9
+
+
+# Helper function to pick, for each [lo, hi) slice of `positions`, the position
+# whose price is lowest (or highest). Ties resolve to the earliest position.
+def _extreme_between(positions, prices, lo, hi, highest=False):
+    width = int((hi - lo).max()) if len(lo) else 0
+    candidates = lo[:, None] + np.arange(max(width, 1))
+    in_range = candidates < hi[:, None]
+    candidates = np.minimum(candidates, len(positions) - 1)
+    values = prices[positions[candidates]]
+    if highest:
+        choice = np.argmax(np.where(in_range, values, -np.inf), axis=1)
+    else:
+        choice = np.argmin(np.where(in_range, values, np.inf), axis=1)
+    return positions[candidates[np.arange(len(lo)), choice]]
+
+
+# Mean volume over volumes[start:stop + 1] for every candidate, skipping NaN
+def _window_means(volumes, start, stop):
+    filled = np.concatenate(([0.0], np.cumsum(np.nan_to_num(volumes))))
+    counts = np.concatenate(([0], np.cumsum(~np.isnan(volumes))))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (filled[stop + 1] - filled[start]) / (counts[stop + 1] - counts[start])
+
+
+# ========================
+# HEAD & SHOULDERS ENGINE
+# ========================
+# Returns a dict of arrays (left, head, right, breakout, shoulder_diff, head_ratio)
+# for every qualifying triple. `inverted=True` looks for the inverted pattern.
+def head_and_shoulders(prices, volumes=None, peaks=None, valleys=None, inverted=False):
+    prices = np.asarray(prices, dtype=float).ravel()
+    volumes = None if volumes is None else np.asarray(volumes, dtype=float).ravel()
+    if peaks is None:
+        peaks, _ = find_peaks(prices)
+    if valleys is None:
+        valleys, _ = find_peaks(-prices)
+
+    # Shoulders/head come from one set of extrema, the neckline from the other
+    pivots, necks = (valleys, peaks) if inverted else (peaks, valleys)
+    empty = np.array([], dtype=np.intp)
+    result = {'left': empty, 'head': empty, 'right': empty, 'breakout': empty,
+              'shoulder_diff': np.array([]), 'head_ratio': np.array([])}
+    if len(pivots) < 3 or len(necks) < 2:
+        return result
+
+    l, h, r = pivots[:-2], pivots[1:-1], pivots[2:]
+    pl, ph, pr = prices[l], prices[h], prices[r]
+
+    # Shoulder symmetry (within 3%)
+    shoulder_diff = np.abs(pl - pr) / np.maximum(pl, pr)
+    ok = ~(shoulder_diff > 0.03)
+
+    # Head prominence (at least 10% beyond both shoulders)
+    if inverted:
+        ok &= ~((ph > pl * 0.90) | (ph > pr * 0.90))
+    else:
+        ok &= ~((ph < pl * 1.10) | (ph < pr * 1.10))
+
+    # Pivot spacing (3-20 periods)
+    ok &= (3 < h - l) & (h - l < 20) & (3 < r - h) & (r - h < 20)
+
+    # Neckline extrema strictly between the pivots
+    left_lo, left_hi = np.searchsorted(necks, l, 'right'), np.searchsorted(necks, h, 'left')
+    right_lo, right_hi = np.searchsorted(necks, h, 'right'), np.searchsorted(necks, r, 'left')
+    ok &= (left_hi > left_lo) & (right_hi > right_lo)
+
+    idx = np.flatnonzero(ok)
+    if len(idx) == 0:
+        return result
+    l, h, r, shoulder_diff = l[idx], h[idx], r[idx], shoulder_diff[idx]
+
+    neck1 = _extreme_between(necks, prices, left_lo[idx], left_hi[idx], highest=inverted)
+    neck2 = _extreme_between(necks, prices, right_lo[idx], right_hi[idx], highest=inverted)
+    slope = (prices[neck2] - prices[neck1]) / (neck2 - neck1)
+
+    # Volume surge at head (if volume data available)
+    keep = np.ones(len(idx), dtype=bool)
+    if volumes is not None:
+        keep &= ~(volumes[h] < _window_means(volumes, l, r) * 1.5)
+
+    # Neckline breakout within the next bars
+    window = r[:, None] + np.arange(1, BREAKOUT_BARS + 1)
+    in_range = window < len(prices)
+    window_prices = prices[np.minimum(window, len(prices) - 1)]
+    neckline = prices[neck1][:, None] + slope[:, None] * (window - neck1[:, None])
+    crossed = (window_prices > neckline) if inverted else (window_prices < neckline)
+    crossed &= in_range
+    keep &= crossed.any(axis=1)
+    breakout = window[np.arange(len(idx)), np.argmax(crossed, axis=1)]
+
+    sel = np.flatnonzero(keep)
+    pivot_extreme = np.minimum(prices[l], prices[r]) if inverted else np.maximum(prices[l], prices[r])
+    return {
+        'left': l[sel],
+        'head': h[sel],
+        'right': r[sel],
+        'breakout': breakout[sel],
+        'shoulder_diff': shoulder_diff[sel],
+        'head_ratio': prices[h[sel]] / pivot_extreme[sel],
+    }
+
+
+def inverted_head_and_shoulders(prices, volumes=None, peaks=None, valleys=None):
+    return head_and_shoulders(prices, volumes, peaks, valleys, inverted=True)
+
+
+# =====================
+# CUP AND HANDLE ENGINE
+# =====================
+# Evaluates every candidate cup bottom i in one pass. The left rim, cup low,
+# handle low and both volume means come from O(n) rolling windows instead of
+# fresh slices per index. Returns a dict of arrays (cup, start, end,
+# retracement, handle_position) for every qualifying location.
+def cup_and_handle(prices, volumes=None, window=30, handle_window=10):
+    prices = np.asarray(prices, dtype=float).ravel()
+    n = len(prices)
+    i = np.arange(window, max(window, n - handle_window - 1))
+
+    empty = np.array([], dtype=np.intp)
+    result = {'cup': empty, 'start': empty, 'end': empty,
+              'retracement': np.array([]), 'handle_position': np.array([])}
+    if len(i) == 0:
+        return result
+
+    series = pd.Series(prices)
+    left_max = series.rolling(window, min_periods=1).max().to_numpy()[i - 1]          # prices[i - window:i]
+    cup_min = series.rolling(window + 1, min_periods=1).min().to_numpy()[i]           # prices[i - window:i + 1]
+    handle_min = series.rolling(handle_window, min_periods=1).min().to_numpy()[i + handle_window]  # prices[i + 1:i + 1 + handle_window]
+
+    cup_volume = handle_volume = None
+    if volumes is not None:
+        volumes = pd.Series(np.asarray(volumes, dtype=float).ravel())
+        cup_volume = volumes.rolling(window + 1, min_periods=1).mean().to_numpy()[i]
+        handle_volume = volumes.rolling(handle_window, min_periods=1).mean().to_numpy()[i + handle_window]
+
+    return _cup_rules(i, left_max, cup_min, handle_min, cup_volume, handle_volume, window, handle_window)
+
+
+# The same rules for the single cup bottom at position i, using plain slices.
+# Cheaper than the rolling pass when only one candidate is new, as in pattern_history.
+def cup_and_handle_at(prices, volumes, i, window=30, handle_window=10):
+    prices = np.asarray(prices, dtype=float).ravel()
+    if i < window or i >= len(prices) - handle_window - 1:
+        return cup_and_handle(prices[:0])
+
+    left_max = np.array([prices[i - window:i].max()])
+    cup_min = np.array([prices[i - window:i + 1].min()])
+    handle_min = np.array([prices[i + 1:i + 1 + handle_window].min()])
+
+    cup_volume = handle_volume = None
+    if volumes is not None:
+        volumes = np.asarray(volumes, dtype=float).ravel()
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN windows stay NaN
+            cup_volume = np.array([np.nanmean(volumes[i - window:i + 1])])
+            handle_volume = np.array([np.nanmean(volumes[i + 1:i + 1 + handle_window])])
+
+    return _cup_rules(np.array([i]), left_max, cup_min, handle_min, cup_volume, handle_volume, window, handle_window)
+
+
+def _cup_rules(i, left_max, cup_min, handle_min, cup_volume, handle_volume, window, handle_window):
+    # Cup depth validation (30-50% retracement)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        retracement = (left_max - cup_min) / left_max
+    ok = (0.3 <= retracement) & (retracement <= 0.5)
+
+    # Handle should form in upper half of cup
+    cup_midpoint = (left_max + cup_min) / 2
+    ok &= ~(handle_min < cup_midpoint)
+
+    # Volume dry-up in handle (if volume available)
+    if cup_volume is not None:
+        ok &= ~(handle_volume > cup_volume * 0.8)
+
+    sel = np.flatnonzero(ok)
+    cup = i[sel]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        handle_position = (handle_min[sel] - cup_midpoint[sel]) / (left_max[sel] - cup_midpoint[sel])
+    return {
+        'cup': cup,
+        'start': cup - window,
+        'end': cup + handle_window,
+        'retracement': retracement[sel],
+        'handle_position': handle_position,
+    }
@@ -0,0 +1,201 @@
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+
+import pandas as pd
+import yfinance as yf
+
+from market_data import DEFAULT_CHUNK_SIZE, FetchedHistories, fetch_price_history, slice_period
+from profiling import profiler
+
+
+# ==================
+# RATE LIMITING
+# ==================
+class RateLimiter:
+    # Thread-safe token bucket: `rate` requests per second with bursts up to `burst`
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_time = (1 - self._tokens) / self.rate
+            time.sleep(wait_time)
+
+
+# Call `fn`, retrying failures with exponential backoff and jitter
+def retry_with_backoff(fn, retries=3, base_delay=0.5, max_delay=8.0):
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception:
+            if attempt == retries:
+                raise
+            delay = min(max_delay, base_delay * 2 ** attempt)
+            time.sleep(delay * random.uniform(0.5, 1.0))
+
+
+# ==================
+# DATA PROVIDERS
+# ==================
+class YahooProvider:
+    # yfinance already shares one HTTP session between calls; an explicit
+    # session can still be supplied to control connection pooling.
+    host = "query2.finance.yahoo.com"
+
+    def __init__(self, session=None):
+        self.session = session
+
+    def history(self, symbols, period='5y', start=None):
+        downloader = partial(yf.download, threads=False, session=self.session)
+        return fetch_price_history(symbols, period=period, start=start, chunk_size=len(symbols) or 1,
+                                   downloader=downloader)
+
+    def info(self, symbol):
+        return yf.Ticker(symbol, session=self.session).info
+
+
+class LocalFileProvider:
+    # Reads <root>/<symbol>.csv (Date-indexed OHLCV) and optional <root>/<symbol>.json
+    # metadata, so tests and benchmarks can run without network access.
+    host = "local"
+
+    def __init__(self, root):
+        self.root = root
+
+    def history(self, symbols, period='5y', start=None):
+        histories = {}
+        for symbol in symbols:
+            path = os.path.join(self.root, f"{symbol}.csv")
+            if not os.path.exists(path):
+                continue
+            history = pd.read_csv(path, index_col=0, parse_dates=True).sort_index()
+            if start is not None:
+                history = history[history.index >= pd.Timestamp(start)]
+            elif period is not None:
+                history = slice_period(history, period)
+            if not history.empty:
+                histories[symbol] = history
+        return histories
+
+    def info(self, symbol):
+        path = os.path.join(self.root, f"{symbol}.json")
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+
+# ==================
+# FETCH ENGINE
+# ==================
+class FetchEngine:
+    # Runs provider requests in a bounded thread pool. Every request goes through
+    # the provider host's rate limiter and is retried with backoff; a task running
+    # longer than `timeout` seconds is abandoned so one stuck request can't stall
+    # the rest. Failures are returned to the caller, never kept on the engine.
+    _limiters = {}
+    _limiters_lock = threading.Lock()
+
+    def __init__(self, provider=None, max_workers=8, requests_per_second=4.0, burst=4,
+                 timeout=30.0, retries=3, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.provider = provider or YahooProvider()
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.retries = retries
+        self.chunk_size = chunk_size
+        self.limiter = self._limiter_for(self.provider.host, requests_per_second, burst)
+
+    @classmethod
+    def _limiter_for(cls, host, rate, burst):
+        # Limiters are shared per host across engine instances
+        with cls._limiters_lock:
+            if host not in cls._limiters:
+                cls._limiters[host] = RateLimiter(rate, burst)
+            return cls._limiters[host]
+
+    def _call(self, fn, started, key, stage):
+        def attempt():
+            self.limiter.acquire()
+            # Timed after the rate limiter, so spans show the provider's own latency
+            with profiler.span(stage, key if isinstance(key, str) else None):
+                return fn()
+
+        started[key] = time.monotonic()
+        return retry_with_backoff(attempt, retries=self.retries)
+
+    # Run {key: callable} concurrently. Returns ({key: result} for the tasks that
+    # succeeded, {key: message} for the tasks that failed or timed out).
+    def _run(self, tasks, stage):
+        results, errors = {}, {}
+        if not tasks:
+            return results, errors
+
+        started = {}
+        pool = ThreadPoolExecutor(max_workers=min(self.max_workers, len(tasks)))
+        try:
+            pending = {pool.submit(self._call, fn, started, key, stage): key for key, fn in tasks.items()}
+            while pending:
+                done, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = pending.pop(future)
+                    try:
+                        results[key] = future.result()
+                    except Exception as e:
+                        errors[key] = str(e)
+                        profiler.count(f"{stage}.errors")
+
+                now = time.monotonic()
+                for future, key in list(pending.items()):
+                    if key in started and now - started[key] > self.timeout:
+                        future.cancel()
+                        del pending[future]
+                        errors[key] = f"Timed out after {self.timeout}s"
+                        profiler.count(f"{stage}.timeouts")
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        return results, errors
+
+    # Same signature as market_data.fetch_price_history, so it can back a PriceCache.
+    # Returns FetchedHistories whose `errors` hold each symbol that failed.
+    def histories(self, symbols, period='5y', start=None):
+        symbols = list(dict.fromkeys(s for s in symbols if s))
+        chunks = [tuple(symbols[i:i + self.chunk_size]) for i in range(0, len(symbols), self.chunk_size)]
+        request = lambda chunk: partial(self.provider.history, list(chunk), period=period, start=start)
+        results, errors = self._run({chunk: request(chunk) for chunk in chunks}, 'fetch.history')
+
+        # A chunk that failed or timed out is retried one symbol at a time, so a
+        # single bad or stuck symbol can't take its chunk-mates down with it
+        retry = [(symbol,) for chunk in errors if len(chunk) > 1 for symbol in chunk]
+        errors = {chunk: message for chunk, message in errors.items() if len(chunk) == 1}
+        if retry:
+            profiler.count('fetch.history.split', len(retry))
+            retried, retry_errors = self._run({key: request(key) for key in retry}, 'fetch.history')
+            results.update(retried)
+            errors.update(retry_errors)
+
+        histories = FetchedHistories(errors={chunk[0]: message for chunk, message in errors.items()})
+        for chunk_result in results.values():
+            histories.update(chunk_result)
+        return histories
+
+    def infos(self, symbols):
+        symbols = list(dict.fromkeys(s for s in symbols if s))
+        infos, _ = self._run({symbol: partial(self.provider.info, symbol) for symbol in symbols}, 'fetch.info')
+        return infos
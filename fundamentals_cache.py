@@ -0,0 +1,88 @@
+import json
+import os
+import threading
+import time
+from datetime import timedelta
+
+from price_cache import CACHE_DIR
+from profiling import profiler
+
+
+# How long each metadata field stays valid. Names almost never change,
+# trailing P/E moves at most once per trading day.
+FIELD_TTLS = {
+    'longName': timedelta(days=30),
+    'shortName': timedelta(days=30),
+    'trailingPE': timedelta(days=1),
+}
+
+
+class FundamentalsCache:
+    # Persists selected yf.Ticker().info fields per exchange-qualified symbol
+    # (e.g. RELIANCE.NS) in a JSON file, each field with its own TTL.
+    def __init__(self, path=os.path.join(CACHE_DIR, "fundamentals.json"), fetch_infos=None, ttls=FIELD_TTLS):
+        self.path = path
+        self.fetch_infos = fetch_infos
+        self.ttls = ttls
+        self._lock = threading.Lock()
+        self._entries = self._read()
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.path)
+
+    def _is_valid(self, symbol, field, now):
+        entry = self._entries.get(symbol, {}).get(field)
+        if entry is None:
+            return False
+        return now - entry['fetched_at'] <= self.ttls[field].total_seconds()
+
+    def stale_symbols(self, symbols, now=None):
+        now = time.time() if now is None else now
+        return [s for s in dict.fromkeys(symbols) if s and not all(self._is_valid(s, f, now) for f in self.ttls)]
+
+    # Cached field values for one symbol, including expired ones; missing fields are omitted
+    def get(self, symbol):
+        fields = self._entries.get(symbol, {})
+        return {field: entry['value'] for field, entry in fields.items() if entry['value'] is not None}
+
+    def put(self, symbol, info, now=None):
+        now = time.time() if now is None else now
+        fields = self._entries.setdefault(symbol, {})
+        for field in self.ttls:
+            # Fields the source does not provide are stored as None so they are not re-requested
+            value = info.get(field)
+            if isinstance(value, float) and value != value:
+                value = None
+            fields[field] = {'value': value, 'fetched_at': now}
+
+    # Fetch metadata in one bulk call for every symbol with at least one expired field
+    def warm(self, symbols, now=None):
+        stale = self.stale_symbols(symbols, now)
+        profiler.count('fundamentals_cache.miss', len(stale))
+        profiler.count('fundamentals_cache.hit', len(set(s for s in symbols if s)) - len(stale))
+        if not stale or self.fetch_infos is None:
+            return 0
+
+        infos = self.fetch_infos(stale)
+        with self._lock:
+            for symbol, info in infos.items():
+                self.put(symbol, info or {}, now)
+            self._write()
+        return len(infos)
+
+    def get_many(self, symbols, now=None):
+        self.warm(symbols, now)
+        return {symbol: self.get(symbol) for symbol in symbols if symbol}
@@ -0,0 +1,65 @@
+import threading
+from collections import OrderedDict, namedtuple
+
+from profiling import profiler
+
+
+# Everything computed for one portfolio row: the table row, the yfinance symbol,
+# its 1y price window and the detected (pattern, recommendation)
+RowResult = namedtuple("RowResult", ["row", "symbol", "window", "pattern"])
+
+MAX_STORED_ROWS = 5000
+
+
+# Normalized (Ticker, Exchange) identity of every row, in portfolio order
+def portfolio_keys(df_portfolio):
+    return [(str(t).strip(), str(e).strip().upper()) for t, e in zip(df_portfolio['Ticker'], df_portfolio['Exchange'])]
+
+
+# Compare two uploads: rows added, removed and kept
+def diff_portfolio(previous_keys, keys):
+    previous, current = set(previous_keys or ()), set(keys)
+    return current - previous, previous - current, current & previous
+
+
+class RowResultStore:
+    # Process-wide per-row results keyed by (Ticker, Exchange), each tagged with
+    # the data version it was computed for. A result for an older version is stale.
+    # The least recently used rows are dropped beyond `max_rows`.
+    def __init__(self, max_rows=MAX_STORED_ROWS):
+        self.max_rows = max_rows
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._rows.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._rows.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, version, result):
+        with self._lock:
+            self._rows[key] = (version, result)
+            self._rows.move_to_end(key)
+            while len(self._rows) > self.max_rows:
+                self._rows.popitem(last=False)
+
+
+# Results for every key, computing only rows that are new or stale for `version`.
+# `analyze_rows(keys)` returns {key: RowResult}. Returns (results in key order,
+# number of rows computed).
+def incremental_results(keys, version, store, analyze_rows):
+    unique_keys = list(dict.fromkeys(keys))
+    cached = {key: store.get(key, version) for key in unique_keys}
+    todo = [key for key in unique_keys if cached[key] is None]
+    profiler.count('rows.reused', len(unique_keys) - len(todo))
+    profiler.count('rows.computed', len(todo))
+
+    if todo:
+        for key, result in analyze_rows(todo).items():
+            store.put(key, version, result)
+            cached[key] = result
+
+    return [cached[key] for key in keys], len(todo)
@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+
+
+RSI_WINDOW = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+OBV_MOMENTUM_PERIODS = 5
+SUPPORT_RESISTANCE_WINDOW = 20
+MA_SHORT, MA_LONG = 50, 200
+
+# BUY/SELL/HOLD voting rule
+RSI_OVERSOLD, RSI_OVERBOUGHT = 30, 70
+MIN_VOTES = 3
+
+INDICATOR_COLUMNS = [
+    'Current Price', 'RSI', 'MACD', 'MACD Signal', 'OBV Momentum',
+    'MA50', 'MA200', 'Support (20d)', 'Resistance (20d)',
+]
+
+
+# ==================
+# PANEL LAYOUT
+# ==================
+# Align one OHLCV field from many histories into a (dates x tickers) panel.
+# Tickers listed later or missing sessions simply hold NaN on those dates.
+def align_panel(histories, field='Close'):
+    columns = {}
+    for symbol, history in histories.items():
+        if history is None or history.empty:
+            continue
+        column = history[field]
+        # yf.download can return single-ticker fields as one-column frames
+        columns[symbol] = column.iloc[:, 0] if isinstance(column, pd.DataFrame) else column
+    if not columns:
+        return pd.DataFrame()
+    return pd.concat(columns, axis=1).sort_index().astype(float)
+
+
+# Move every column's valid values to the bottom of the panel, preserving their order.
+# In this compact layout each column is one contiguous series with leading NaNs,
+# which is exactly what the per-ticker `ta` indicators see. `order` maps compact
+# rows back to panel rows.
+def compact_panel(panel):
+    values = panel.to_numpy(dtype=float)
+    order = np.argsort(~np.isnan(values), axis=0, kind='stable')
+    return np.take_along_axis(values, order, axis=0), order
+
+
+def expand_panel(compact, order, template):
+    values = np.empty_like(compact)
+    np.put_along_axis(values, order, compact, axis=0)
+    return pd.DataFrame(values, index=template.index, columns=template.columns)
+
+
+# ==================
+# INDICATORS
+# ==================
+# The functions below operate column-wise on compact panels and mirror the
+# formulas of ta.momentum.RSIIndicator, ta.trend.MACD and
+# ta.volume.OnBalanceVolumeIndicator.
+def rsi(close, window=RSI_WINDOW):
+    diff = close.diff(1)
+    up = diff.where(diff > 0, 0.0).where(close.notna())
+    down = -diff.where(diff < 0, 0.0).where(close.notna())
+    ema_up = up.ewm(alpha=1 / window, min_periods=window, adjust=False).mean()
+    ema_down = down.ewm(alpha=1 / window, min_periods=window, adjust=False).mean()
+    values = np.where(ema_down == 0, 100, 100 - (100 / (1 + ema_up / ema_down)))
+    return pd.DataFrame(values, index=close.index, columns=close.columns).where(ema_down.notna())
+
+
+def _ema(panel, periods):
+    return panel.ewm(span=periods, min_periods=periods, adjust=False).mean()
+
+
+def macd(close, fast=MACD_FAST, slow=MACD_SLOW, signal=MACD_SIGNAL):
+    macd_line = _ema(close, fast) - _ema(close, slow)
+    return macd_line, _ema(macd_line, signal)
+
+
+def on_balance_volume(close, volume):
+    signed = np.where(close < close.shift(1), -volume, volume)
+    return pd.DataFrame(signed, index=close.index, columns=close.columns).where(close.notna()).cumsum()
+
+
+def support_resistance(close, window=SUPPORT_RESISTANCE_WINDOW):
+    rolling = close.rolling(window=window, min_periods=1)
+    return rolling.min(), rolling.max()
+
+
+# Compute every indicator for all tickers at once.
+# Returns {name: (dates x tickers) panel} aligned with `close`.
+def compute_indicators(close, volume):
+    compact_close, order = compact_panel(close)
+    compact_volume = np.take_along_axis(volume.reindex_like(close).to_numpy(dtype=float), order, axis=0)
+
+    c = pd.DataFrame(compact_close, columns=close.columns)
+    v = pd.DataFrame(compact_volume, columns=close.columns)
+
+    macd_line, macd_signal = macd(c)
+    obv = on_balance_volume(c, v)
+    support, resistance = support_resistance(c)
+
+    compact = {
+        'Current Price': c,
+        'RSI': rsi(c),
+        'MACD': macd_line,
+        'MACD Signal': macd_signal,
+        'OBV Momentum': obv - obv.shift(OBV_MOMENTUM_PERIODS),
+        'MA50': c.rolling(window=MA_SHORT).mean(),
+        'MA200': c.rolling(window=MA_LONG).mean(),
+        'Support (20d)': support,
+        'Resistance (20d)': resistance,
+    }
+    return {name: expand_panel(panel.to_numpy(), order, close) for name, panel in compact.items()}
+
+
+# Latest value of every indicator per ticker, taken at each ticker's own last bar
+def latest_indicators(close, volume):
+    if close.empty:
+        return pd.DataFrame(columns=INDICATOR_COLUMNS, dtype=float)
+
+    panels = compute_indicators(close, volume)
+    valid = close.notna().to_numpy()
+    last_rows = len(close) - 1 - np.argmax(valid[::-1], axis=0)
+    columns = np.arange(close.shape[1])
+
+    latest = pd.DataFrame({name: panel.to_numpy()[last_rows, columns] for name, panel in panels.items()},
+                          index=close.columns)
+    latest.loc[~valid.any(axis=0)] = np.nan
+    return latest
+
+
+# ==================
+# RECOMMENDATION SCORE
+# ==================
+# Vectorized version of the 3-of-4 voting rule. Works on latest-value Series
+# or on full (dates x tickers) panels; NaN inputs never cast a vote.
+def score_recommendations(rsi_values, macd_values, macd_signal, close, ma50, obv_momentum,
+                          rsi_oversold=RSI_OVERSOLD, rsi_overbought=RSI_OVERBOUGHT, min_votes=MIN_VOTES):
+    buy_score = ((rsi_values < rsi_oversold).astype(int)
+                 + (macd_values > macd_signal).astype(int)
+                 + (close > ma50).astype(int)
+                 + (obv_momentum > 0).astype(int))
+    sell_score = ((rsi_values > rsi_overbought).astype(int)
+                  + (macd_values < macd_signal).astype(int)
+                  + (close < ma50).astype(int)
+                  + (obv_momentum < 0).astype(int))
+
+    recommendation = np.where(buy_score >= min_votes, 'BUY', np.where(sell_score >= min_votes, 'SELL', 'HOLD'))
+    if isinstance(buy_score, pd.DataFrame):
+        recommendation = pd.DataFrame(recommendation, index=buy_score.index, columns=buy_score.columns)
+    else:
+        recommendation = pd.Series(recommendation, index=buy_score.index)
+    return buy_score, sell_score, recommendation
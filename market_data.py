@@ -0,0 +1,90 @@
+import pandas as pd
+import yfinance as yf
+
+
+EXCHANGE_SUFFIXES = {
+    "NSE": ".NS",
+    "BSE": ".BO",
+}
+
+# Number of symbols requested per multi-ticker yf.download call
+DEFAULT_CHUNK_SIZE = 50
+
+
+# Map a portfolio (ticker, exchange) row to its Yahoo Finance symbol.
+# Returns None for exchanges we do not support.
+def resolve_symbol(ticker, exchange):
+    suffix = EXCHANGE_SUFFIXES.get(str(exchange).strip().upper())
+    if suffix is None:
+        return None
+    return f"{str(ticker).strip()}{suffix}"
+
+
+# Split a multi-ticker yf.download frame into one OHLCV frame per symbol.
+def split_download(frame, symbols):
+    histories = {}
+    if frame is None or frame.empty:
+        return histories
+
+    if isinstance(frame.columns, pd.MultiIndex):
+        available = set(frame.columns.get_level_values(0))
+        for symbol in symbols:
+            if symbol not in available:
+                continue
+            history = frame[symbol].dropna(how='all')
+            if not history.empty:
+                histories[symbol] = history
+    elif len(symbols) == 1:
+        history = frame.dropna(how='all')
+        if not history.empty:
+            histories[symbols[0]] = history
+
+    return histories
+
+
+# What a history fetcher returns: {symbol: OHLCV DataFrame}, plus `errors`
+# {symbol: message} for symbols whose request failed (as opposed to symbols the
+# source has no data for)
+class FetchedHistories(dict):
+    def __init__(self, histories=(), errors=None):
+        super().__init__(histories)
+        self.errors = dict(errors or {})
+
+
+# Bulk fetch OHLCV history for many symbols using chunked multi-ticker requests.
+# `downloader` defaults to yf.download and can be replaced by a stub offline.
+def fetch_price_history(symbols, period='5y', start=None, chunk_size=DEFAULT_CHUNK_SIZE, downloader=None):
+    downloader = downloader or yf.download
+    symbols = list(dict.fromkeys(s for s in symbols if s))
+
+    kwargs = {'start': start} if start is not None else {'period': period}
+
+    histories = {}
+    for i in range(0, len(symbols), chunk_size):
+        chunk = symbols[i:i + chunk_size]
+        frame = downloader(chunk, group_by='ticker', progress=False, **kwargs)
+        histories.update(split_download(frame, chunk))
+
+    return histories
+
+
+# Derive a shorter trailing window (e.g. 1y) from an already downloaded history
+def slice_period(history, period='1y'):
+    if history is None or history.empty:
+        return history
+
+    offsets = {
+        '1mo': pd.DateOffset(months=1),
+        '3mo': pd.DateOffset(months=3),
+        '6mo': pd.DateOffset(months=6),
+        '1y': pd.DateOffset(years=1),
+        '2y': pd.DateOffset(years=2),
+        '3y': pd.DateOffset(years=3),
+        '5y': pd.DateOffset(years=5),
+    }
+    if period not in offsets:
+        raise ValueError(f"Unsupported period: {period}")
+
+    # Positional slice of the (sorted) history, so memory-mapped frames stay views
+    cutoff = history.index[-1] - offsets[period]
+    return history.iloc[history.index.searchsorted(cutoff, side='right'):]
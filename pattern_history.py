@@ -0,0 +1,210 @@
+from bisect import bisect_left, bisect_right
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from chart_patterns import PATTERN_RECOMMENDATIONS, PATTERN_SCANNERS, PatternFeatures, PatternMatch
+from fast_patterns import BREAKOUT_BARS
+
+
+# Trailing window the detectors see, about one year of daily bars
+PATTERN_WINDOW = 252
+CUP_WINDOW, HANDLE_WINDOW = 30, 10
+
+SCANNERS = dict(PATTERN_SCANNERS)
+
+TIMELINE_COLUMNS = ['Confirmed', 'Pattern', 'Recommendation', 'Start', 'End', 'Confidence']
+
+
+# ==================
+# INCREMENTAL EXTREMA
+# ==================
+class _ExtremaTracker:
+    # Confirms local maxima (or minima) one bar at a time with find_peaks'
+    # plateau rule: a flat run that is entered from below and left downwards is
+    # a peak at its midpoint. `positions` and `left_edges` only ever grow, so
+    # extrema found once are reused for every later window.
+    def __init__(self, sign):
+        self.sign = sign
+        self.positions = []
+        self.left_edges = []
+        self._run_start = 0
+        self._entered = False
+        self._last = None
+
+    # Returns the newly confirmed position, if the bar at `t` closes a run
+    def push(self, t, price):
+        value = self.sign * price
+        confirmed = None
+        if self._last is not None and value != self._last:
+            if self._entered and value < self._last:
+                confirmed = (self._run_start + t - 1) // 2
+                self.positions.append(confirmed)
+                self.left_edges.append(self._run_start)
+            self._run_start = t
+            self._entered = value > self._last
+        self._last = value
+        return confirmed
+
+
+class _WindowView:
+    # The subset of PatternFeatures the peak-based and cup scanners read,
+    # built over a short slice of the history
+    def __init__(self, prices, volumes, peaks, valleys):
+        self.prices = prices
+        self.volumes = volumes
+        self.peaks = np.asarray(peaks, dtype=np.intp)
+        self.valleys = np.asarray(valleys, dtype=np.intp)
+
+
+# ==================
+# PATTERN HISTORY
+# ==================
+class PatternHistory:
+    # Replays detect_all_patterns over a trailing `window` as it advances one bar
+    # at a time, recording the bar at which each occurrence first appears.
+    # Instead of rescanning the window, every bar re-checks only what it can change:
+    # - double/triple tops and bottoms ending at a newly confirmed extremum
+    # - head & shoulders whose breakout window still includes this bar
+    # - the one cup whose handle has just completed
+    # - the triangle, only once the detector's breakout test passes
+    def __init__(self, window=PATTERN_WINDOW, has_volume=True):
+        self.window = window
+        self.has_volume = has_volume
+        self.prices = []
+        self.volumes = []
+        self.peaks = _ExtremaTracker(1)
+        self.valleys = _ExtremaTracker(-1)
+        self.events = []
+        self._seen = set()
+        # Monotonic deques of window positions for the running max/min
+        self._max = deque()
+        self._min = deque()
+
+    def _slice(self, start, stop):
+        prices = np.array(self.prices[start:stop], dtype=float)
+        volumes = np.array(self.volumes[start:stop], dtype=float) if self.has_volume else None
+        return prices, volumes
+
+    def _record(self, t, name, start, end, confidence):
+        key = (name, int(start), int(end))
+        if key in self._seen:
+            return None
+        self._seen.add(key)
+        match = PatternMatch(name, PATTERN_RECOMMENDATIONS.get(name, "hold"), int(start), int(end), confidence)
+        self.events.append((t, match))
+        return match
+
+    # True if the extremum's whole run lies inside the window, as find_peaks needs
+    def _in_window(self, tracker, k, window_start):
+        return k >= 0 and tracker.left_edges[k] > window_start
+
+    def _check_repeats(self, t, window_start, tracker, count, name):
+        k = len(tracker.positions) - count
+        if not self._in_window(tracker, k, window_start):
+            return []
+        extrema = tracker.positions[k:]
+        lo = extrema[0]
+        prices, _ = self._slice(lo, t + 1)
+        local = [e - lo for e in extrema]
+        view = _WindowView(prices, None, local, local)
+        return [(name, s + lo, e + lo, c) for s, e, c in SCANNERS[name](view)]
+
+    def _check_head_and_shoulders(self, t, window_start, pivots, necks, name, fresh):
+        # Triples whose right pivot may still break out, plus one just confirmed
+        k = bisect_left(pivots.positions, t - BREAKOUT_BARS)
+        if fresh is not None:
+            k = min(k, len(pivots.positions) - 1)
+        k = max(k - 2, 0)
+        while k < len(pivots.positions) and not self._in_window(pivots, k, window_start):
+            k += 1
+        if len(pivots.positions) - k < 3:
+            return []
+
+        lo = pivots.positions[k]
+        neck_lo = bisect_right(necks.positions, lo)
+        prices, volumes = self._slice(lo, t + 1)
+        view = _WindowView(prices, volumes,
+                           [p - lo for p in pivots.positions[k:]],
+                           [p - lo for p in necks.positions[neck_lo:]])
+        if pivots is self.valleys:
+            view.peaks, view.valleys = view.valleys, view.peaks
+        return [(name, s + lo, e + lo, c) for s, e, c in SCANNERS[name](view)]
+
+    def _check_cup(self, t, window_start):
+        cup = t - HANDLE_WINDOW - 1
+        lo = cup - CUP_WINDOW
+        if lo < window_start:
+            return []
+        prices, volumes = self._slice(lo, t + 1)
+        view = _WindowView(prices, volumes, (), ())
+        scan = SCANNERS["Cup and Handle"](view, CUP_WINDOW, HANDLE_WINDOW, at=CUP_WINDOW)
+        return [("Cup and Handle", s + lo, e + lo, c) for s, e, c in scan]
+
+    def _check_triangle(self, t, window_start):
+        last = self.prices[t]
+        high, low = self.prices[self._max[0]], self.prices[self._min[0]]
+        if not (last > high * 1.02 or last < low * 0.98):
+            return []
+        prices, volumes = self._slice(window_start, t + 1)
+        f = PatternFeatures(prices, volumes)
+        return [("Symmetrical Triangle", s + window_start, e + window_start, c)
+                for s, e, c in SCANNERS["Symmetrical Triangle"](f)]
+
+    def _track_range(self, t, price, window_start):
+        for positions, better in ((self._max, lambda a, b: a >= b), (self._min, lambda a, b: a <= b)):
+            while positions and better(price, self.prices[positions[-1]]):
+                positions.pop()
+            positions.append(t)
+            while positions[0] < window_start:
+                positions.popleft()
+
+    # Advance by one bar. Returns the PatternMatch objects first seen at this bar.
+    def update(self, close, volume=np.nan):
+        t = len(self.prices)
+        self.prices.append(float(close))
+        self.volumes.append(float(volume) if volume is not None else np.nan)
+        window_start = max(0, t - self.window + 1)
+        self._track_range(t, close, window_start)
+
+        new_peak = self.peaks.push(t, close)
+        new_valley = self.valleys.push(t, close)
+
+        hits = []
+        if new_peak is not None:
+            hits += self._check_repeats(t, window_start, self.peaks, 2, "Double Top")
+            hits += self._check_repeats(t, window_start, self.peaks, 3, "Triple Top")
+        if new_valley is not None:
+            hits += self._check_repeats(t, window_start, self.valleys, 2, "Double Bottom")
+            hits += self._check_repeats(t, window_start, self.valleys, 3, "Triple Bottom")
+        hits += self._check_head_and_shoulders(t, window_start, self.peaks, self.valleys, "Head & Shoulders", new_peak)
+        hits += self._check_head_and_shoulders(t, window_start, self.valleys, self.peaks,
+                                               "Inverted Head & Shoulders", new_valley)
+        hits += self._check_cup(t, window_start)
+        hits += self._check_triangle(t, window_start)
+
+        matches = [self._record(t, *hit) for hit in hits]
+        return [m for m in matches if m is not None]
+
+
+# Per-occurrence timeline for one OHLCV history: the date each pattern first
+# confirmed on the trailing window, with its start/end dates and confidence
+def pattern_timeline(history, window=PATTERN_WINDOW):
+    history = history.dropna(subset=['Close'])
+    has_volume = 'Volume' in history
+    scanner = PatternHistory(window, has_volume)
+    volumes = history['Volume'].to_numpy(dtype=float) if has_volume else np.full(len(history), np.nan)
+    for close, volume in zip(history['Close'].to_numpy(dtype=float), volumes):
+        scanner.update(close, volume)
+
+    dates = history.index
+    rows = [{
+        'Confirmed': dates[t],
+        'Pattern': match.name,
+        'Recommendation': match.recommendation,
+        'Start': dates[match.start],
+        'End': dates[match.end],
+        'Confidence': match.confidence,
+    } for t, match in scanner.events]
+    return pd.DataFrame(rows, columns=TIMELINE_COLUMNS)
@@ -0,0 +1,167 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from chart_patterns import detect_chart_pattern
+from prefilter import screen_patterns
+from profiling import profiler
+
+
+NO_PATTERN = ("No clear pattern", "hold")
+
+# Reported in place of (pattern, recommendation) when a detector raised, so the
+# caller can surface the error instead of showing "No clear pattern"
+DetectionError = namedtuple("DetectionError", ["pattern", "recommendation", "error"])
+PATTERN_FAILED = "Pattern detection failed"
+
+# Below this many symbols the pool start-up costs more than it saves
+MIN_PARALLEL_SYMBOLS = 32
+
+# Workers are never forked from the caller: the Streamlit server is
+# multithreaded, and forking it can copy locks held by other threads. The
+# forkserver imports this module once, so workers start without re-importing scipy.
+if 'forkserver' in multiprocessing.get_all_start_methods():
+    POOL_CONTEXT = multiprocessing.get_context('forkserver')
+    POOL_CONTEXT.set_forkserver_preload([__name__])
+else:
+    POOL_CONTEXT = multiprocessing.get_context('spawn')
+
+
+# ==================
+# SHARED BUFFERS
+# ==================
+class PriceBuffers:
+    # Packs every symbol's close/volume array end to end into two .npy files that
+    # workers memory-map read-only, so series are shared through the page cache
+    # instead of being pickled per task. `layout` maps symbol -> (offset, length, has_volume).
+    def __init__(self, series, directory=None):
+        self.directory = tempfile.mkdtemp(prefix="pfanalyzer-", dir=directory)
+        self.close_path = os.path.join(self.directory, "close.npy")
+        self.volume_path = os.path.join(self.directory, "volume.npy")
+        self.layout = {}
+
+        total = sum(len(close) for close, _ in series.values())
+        close_buffer = np.lib.format.open_memmap(self.close_path, mode="w+", dtype=np.float64, shape=(total,))
+        volume_buffer = np.lib.format.open_memmap(self.volume_path, mode="w+", dtype=np.float64, shape=(total,))
+
+        offset = 0
+        for symbol, (close, volume) in series.items():
+            length = len(close)
+            close_buffer[offset:offset + length] = close
+            if volume is not None:
+                volume_buffer[offset:offset + length] = volume
+            self.layout[symbol] = (offset, length, volume is not None)
+            offset += length
+
+        close_buffer.flush()
+        volume_buffer.flush()
+        del close_buffer, volume_buffer
+
+    def cleanup(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cleanup()
+
+
+# ==================
+# WORKERS
+# ==================
+_close = None
+_volume = None
+
+
+def _init_worker(close_path, volume_path, profile=False):
+    global _close, _volume
+    _close = np.load(close_path, mmap_mode="r")
+    _volume = np.load(volume_path, mmap_mode="r")
+    # Forked workers inherit the parent's spans; start from an empty record
+    profiler.reset()
+    profiler.enable(profile)
+
+
+# Returns the chunk's results plus any spans recorded, for the parent to merge
+def _scan_chunk(items):
+    results = []
+    for symbol, offset, length, has_volume, candidates in items:
+        close = _close[offset:offset + length]
+        volume = _volume[offset:offset + length] if has_volume else None
+        results.append((symbol, _detect(symbol, close, volume, candidates)))
+    return results, profiler.drain()
+
+
+def _detect(symbol, close, volume, candidates=None):
+    if len(close) == 0:
+        return NO_PATTERN
+    with profiler.ticker(symbol), profiler.span("patterns.detect"):
+        try:
+            return detect_chart_pattern(close, volume, candidates)
+        except Exception as e:
+            profiler.count("patterns.errors")
+            return DetectionError(PATTERN_FAILED, "hold", f"Pattern detection failed: {e}")
+
+
+# ==================
+# PORTFOLIO SCAN
+# ==================
+# Run detect_chart_pattern over every symbol. `series` maps symbol -> (close, volume)
+# ndarrays (volume may be None). Returns {symbol: (pattern, recommendation)}, with a
+# DetectionError for symbols whose detector raised.
+# `buffers` may point workers at files that already hold every series (such as
+# ColumnarPriceStore.pattern_buffers); otherwise the series are packed into
+# temporary PriceBuffers. With `prefilter`, every series is first screened
+# against cheap necessary conditions and only the surviving detectors run;
+# symbols with no surviving pattern never reach a worker.
+def scan_patterns(series, max_workers=None, min_parallel=MIN_PARALLEL_SYMBOLS, buffers=None, prefilter=True):
+    results = {}
+    candidates = {}
+    if prefilter and series:
+        with profiler.span("patterns.prefilter"):
+            candidates = screen_patterns(series).candidates
+        results = {symbol: NO_PATTERN for symbol, names in candidates.items() if not names}
+        series = {symbol: values for symbol, values in series.items() if symbol not in results}
+
+    max_workers = max_workers or os.cpu_count() or 1
+    if len(series) < min_parallel or max_workers == 1:
+        results.update({symbol: _detect(symbol, close, volume, candidates.get(symbol))
+                        for symbol, (close, volume) in series.items()})
+        return results
+
+    if buffers is not None and not set(series) <= set(buffers.layout):
+        buffers = None
+
+    with (nullcontext(buffers) if buffers is not None else PriceBuffers(series)) as buffers:
+        items = [(symbol, *buffers.layout[symbol], candidates.get(symbol)) for symbol in series]
+        # A few chunks per worker keeps the pool balanced without per-symbol overhead
+        chunk_size = max(1, len(items) // (max_workers * 4))
+        chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=POOL_CONTEXT,
+                                 initializer=_init_worker,
+                                 initargs=(buffers.close_path, buffers.volume_path, profiler.enabled)) as pool:
+            for chunk_results, (spans, counters) in pool.map(_scan_chunk, chunks):
+                results.update(chunk_results)
+                profiler.merge(spans, counters)
+
+    return results
+
+
+# Close/volume arrays for the pattern window of each history, with missing closes dropped
+def pattern_series(histories):
+    series = {}
+    for symbol, history in histories.items():
+        if history is None or history.empty:
+            continue
+        history = history.dropna(subset=['Close'])
+        volume = history['Volume'].to_numpy(dtype=float) if 'Volume' in history else None
+        series[symbol] = (history['Close'].to_numpy(dtype=float), volume)
+    return series
@@ -1,9 +1,83 @@
+import hashlib
+import io
+from functools import partial
+
 import pandas as pd
 import streamlit as st
-import ta
-import yfinance as yf
 
-from chart_patterns import detect_chart_pattern
+from chart_patterns import PATTERN_RECOMMENDATIONS
+from columnar_store import ColumnarPriceStore
+from fetch_engine import FetchEngine
+from fundamentals_cache import FundamentalsCache
+from incremental import RowResultStore, diff_portfolio, incremental_results, portfolio_keys
+from market_data import resolve_symbol, slice_period
+from pattern_scan import NO_PATTERN
+from portfolio_engine import add_risk_columns, analyze_rows, analyzed_symbols, holdings_risk, results_table
+from price_cache import PriceCache, data_version
+from price_levels import LevelStore
+from profiling import profiler
+from risk import RISK_WINDOW, correlation_heatmap
+from shared_cache import SharedDataStore
+from timeframes import TIMEFRAMES, BarStore
+
+# Process-wide data store shared by every session, so users opening the app
+# at the same time fetch each symbol only once
+@st.cache_resource
+def get_shared_store():
+    engine = FetchEngine()
+    return SharedDataStore(
+        PriceCache(fetcher=engine.histories, period='5y'),
+        FundamentalsCache(fetch_infos=engine.infos),
+        columnar=ColumnarPriceStore(),
+    )
+
+
+# Per-row results shared by every session, so re-uploads only compute changed rows
+@st.cache_resource
+def get_row_store():
+    return RowResultStore()
+
+
+# Weekly/monthly bars shared by every session, so each rerun only re-aggregates the latest bar
+@st.cache_resource
+def get_bar_store():
+    return BarStore()
+
+
+# Next-resistance level indexes shared by every session, rebuilt only when a symbol's history changes
+@st.cache_resource
+def get_level_store():
+    return LevelStore()
+
+
+# Portfolio-level risk across the analyzed holdings, from the shared 5y histories.
+# Its panels (book, correlation and covariance matrices) are shared by reference
+# rather than pickled with the cached results on every rerun.
+@st.cache_resource(max_entries=32)
+def get_portfolio_risk(version, symbols):
+    return holdings_risk(symbols, get_shared_store())
+
+
+# Full analysis pipeline. Results are cached on the uploaded CSV's content hash and
+# the market data version, so widget reruns reuse them until new data is due. Rows
+# already computed for this data version (in any earlier upload) are reused. Only
+# the results table, each row's symbol and the pattern scan are cached here; price
+# windows are read from the shared columnar store when a ticker is charted.
+@st.cache_data(show_spinner="Analyzing portfolio...", max_entries=32)
+def run_analysis(csv_digest, version, _df_portfolio):
+    keys = portfolio_keys(_df_portfolio)
+    analyze = partial(analyze_rows, store=get_shared_store(), bar_store=get_bar_store(), level_store=get_level_store())
+    row_results, computed = incremental_results(keys, version, get_row_store(), analyze)
+
+    results = results_table(row_results)
+    symbols = [r.symbol for r in row_results]
+    patterns = {r.symbol: r.pattern for r in row_results if r.symbol}
+
+    # The table's risk columns and the heatmap come from the same risk pass
+    risk = get_portfolio_risk(version, analyzed_symbols(results, symbols))
+    add_risk_columns(results, row_results, get_shared_store(), risk)
+    return results, symbols, patterns, computed
+
 
 st.title("Portfolio Technical Analysis (NSE/BSE Supported)")
 
@@ -40,165 +114,70 @@ st.markdown(
 uploaded_file = st.file_uploader("Upload your portfolio CSV", type=["csv"])
 
 if uploaded_file is not None:
-    df_portfolio = pd.read_csv(uploaded_file)
+    csv_bytes = uploaded_file.getvalue()
+    csv_digest = hashlib.sha256(csv_bytes).hexdigest()
+    df_portfolio = pd.read_csv(io.BytesIO(csv_bytes))
     if 'Ticker' not in df_portfolio.columns or 'Exchange' not in df_portfolio.columns:
         st.error("CSV must have 'Ticker' and 'Exchange' columns (Exchange should be 'NSE' or 'BSE').")
     else:
-        results = []
-        for _, row in df_portfolio.iterrows():
-            ticker = str(row['Ticker']).strip()
-            exchange = str(row['Exchange']).strip().upper()
-            if exchange == 'NSE':
-                yf_ticker = f"{ticker}.NS"
-            elif exchange == 'BSE':
-                yf_ticker = f"{ticker}.BO"
-            else:
-                results.append({
-                    'Ticker': ticker,
-                    'Name': 'Error',
-                    'RSI': 'Error',
-                    'MACD': 'Error',
-                    'MACD Signal': 'Error',
-                    'OBV Momentum': 'Error',
-                    'MA50': 'Error',
-                    'MA200': 'Error',
-                    'Current Price': 'Error',
-                    'Support (20d)': 'Error',
-                    'Resistance (20d)': 'Error',
-                    'Next Resistance (1y)': 'Error',
-                    'PE Ratio': 'Error',
-                    'Recommendation': f"Unknown exchange: {exchange}"
-                })
-                continue
-
-            try:
-                # Download 1 year for indicators, 5 years for next resistance
-                data = yf.download(yf_ticker, period='1y')
-                data_5y = yf.download(yf_ticker, period='5y')
-
-                if data.empty or data_5y.empty:
-                    results.append({
-                        'Ticker': ticker,
-                        'Name': 'No Data',
-                        'RSI': 'No Data',
-                        'MACD': 'No Data',
-                        'MACD Signal': 'No Data',
-                        'OBV Momentum': 'No Data',
-                        'MA50': 'No Data',
-                        'MA200': 'No Data',
-                        'Current Price': 'No Data',
-                        'Support (20d)': 'No Data',
-                        'Resistance (20d)': 'No Data',
-                        'Next Resistance (5y)': 'No Data',
-                        'PE Ratio': 'No Data',
-                        'Recommendation': 'No Data'
-                    })
-                    continue
-
-                # Extract relevant data
-                close = data['Close'].squeeze()
-                volume = data['Volume'].squeeze()
-                close_5y = data_5y['Close'].squeeze()
-
-                # Indicator calculations
-                rsi = ta.momentum.RSIIndicator(close).rsi().iloc[-1]
-                macd_obj = ta.trend.MACD(close)
-                macd = macd_obj.macd().iloc[-1]
-                macd_signal = macd_obj.macd_signal().iloc[-1]
-                obv = ta.volume.OnBalanceVolumeIndicator(close, volume).on_balance_volume()
-                obv_momentum = obv.iloc[-1] - obv.iloc[-6] if len(obv) > 5 else float('nan')
-                ma50 = close.rolling(window=50).mean().iloc[-1]
-                ma200 = close.rolling(window=200).mean().iloc[-1]
-                last_close = close.iloc[-1]
-
-                # Get full name and PE ratio
-                info = yf.Ticker(yf_ticker).info
-                if exchange.upper() == "BSE":
-                    name = info.get('longName') or info.get('shortName')
-                else:
-                    name = info.get("longName", "")
-                pe_ratio = info.get('trailingPE', float('nan'))
-
-                # Support/Resistance logic (20d)
-                last_20 = close[-20:] if len(close) >= 20 else close
-                support = last_20.min() if len(last_20) > 0 else float('nan')
-                resistance = last_20.max() if len(last_20) > 0 else float('nan')
-
-                # Next resistance above current resistance (from 5y data)
-                next_resist_candidates = [x for x in set(close_5y) if x > resistance]
-                next_resistance = min(next_resist_candidates) if next_resist_candidates else float('nan')
-
-                # Recommendation logic using a scoring system
-                buy_score = 0
-                sell_score = 0
-
-                if rsi < 30:
-                    buy_score += 1
-                elif rsi > 70:
-                    sell_score += 1
-
-                if macd > macd_signal:
-                    buy_score += 1
-                elif macd < macd_signal:
-                    sell_score += 1
-
-                if pd.notna(ma50):
-                    if last_close > ma50:
-                        buy_score += 1
-                    elif last_close < ma50:
-                        sell_score += 1
-
-                if pd.notna(obv_momentum):
-                    if obv_momentum > 0:
-                        buy_score += 1
-                    elif obv_momentum < 0:
-                        sell_score += 1
-
-                if buy_score >= 3:
-                    rec = 'BUY'
-                elif sell_score >= 3:
-                    rec = 'SELL'
-                else:
-                    rec = 'HOLD'
-
-                results.append({
-                    'Ticker': ticker,
-                    'Name': name,
-                    'RSI': round(rsi, 2),
-                    'MACD': round(macd, 2),
-                    'MACD Signal': round(macd_signal, 2),
-                    'OBV Momentum': round(obv_momentum, 2) if pd.notna(obv_momentum) else float('nan'),
-                    'MA50': round(ma50, 2) if pd.notna(ma50) else float('nan'),
-                    'MA200': round(ma200, 2) if pd.notna(ma200) else float('nan'),
-                    'Current Price': round(last_close, 2),
-                    'Support (20d)': round(support, 2) if pd.notna(support) else float('nan'),
-                    'Resistance (20d)': round(resistance, 2) if pd.notna(resistance) else float('nan'),
-                    'Next Resistance (5y)': round(next_resistance, 2) if pd.notna(next_resistance) else float('nan'),
-                    'PE Ratio': round(pe_ratio, 2) if pd.notna(pe_ratio) else float('nan'),
-                    'Recommendation': rec
-                })
-            except Exception as e:
-                results.append({
-                    'Ticker': ticker,
-                    'Name': 'Error',
-                    'RSI': 'Error',
-                    'MACD': 'Error',
-                    'MACD Signal': 'Error',
-                    'OBV Momentum': 'Error',
-                    'MA50': 'Error',
-                    'MA200': 'Error',
-                    'Current Price': 'Error',
-                    'Support (20d)': 'Error',
-                    'Resistance (20d)': 'Error',
-                    'Next Resistance (1y)': 'Error',
-                    'PE Ratio': 'Error',
-                    'Recommendation': f'Error: {e}'
-                })
+        version = data_version()
+        results, symbols, patterns, computed = run_analysis(csv_digest, version, df_portfolio)
+        risk = get_portfolio_risk(version, analyzed_symbols(results, symbols))
+
+        # Report how much of a re-uploaded portfolio actually had to be recomputed
+        if st.session_state.get('csv_digest') != csv_digest:
+            keys = portfolio_keys(df_portfolio)
+            added, removed, _ = diff_portfolio(st.session_state.get('portfolio_keys'), keys)
+            st.session_state['csv_digest'] = csv_digest
+            st.session_state['portfolio_keys'] = keys
+            st.session_state['refresh_summary'] = (
+                f"Computed {computed} of {len(set(keys))} holdings "
+                f"({len(added)} added, {len(removed)} removed since the last upload)."
+            )
+        st.caption(st.session_state['refresh_summary'])
 
     # ...after the loop...
     st.subheader("Analysis Results")
-    results_df = pd.DataFrame(results)
-    st.dataframe(results_df, use_container_width=True)
+    # Typed columns go to the browser as Arrow as-is; the frame backs the widgets below
+    results_df = results.to_frame()
+    st.dataframe(results.to_arrow(), use_container_width=True)
+
+    # The profiler is process-wide, so it is a server setting (PFANALYZER_PROFILE=1)
+    # rather than a per-session toggle; cached reruns record nothing
+    if profiler.enabled:
+        with st.expander("Profiling"):
+            st.caption("Spans and cache counters recorded by this server process, across all sessions, "
+                       "since the last reset. Enabled with PFANALYZER_PROFILE=1.")
+            st.write("**Slowest stages**")
+            st.dataframe(profiler.stage_summary(), use_container_width=True)
+            st.write("**Slowest tickers**")
+            st.dataframe(profiler.ticker_summary(), use_container_width=True)
+            st.write("**Cache hits and misses**")
+            st.json(profiler.counters())
+            col_json, col_csv, col_reset = st.columns(3)
+            col_json.download_button("Download spans (JSON)", profiler.to_json(), "pfanalyzer-spans.json", "application/json")
+            col_csv.download_button("Download spans (CSV)", profiler.to_csv(), "pfanalyzer-spans.csv", "text/csv")
+            if col_reset.button("Reset profiling data"):
+                profiler.reset()
+
+    # Portfolio-level risk: equal-weight book summary, correlation heatmap and drawdown,
+    # skipped when no holding could be analyzed
+    summary = risk.summary
+    if summary['Holdings'] > 0:
+        st.markdown("### Portfolio Risk")
+        st.caption(f"Equal-weight book of {int(summary['Holdings'])} holdings. Correlations, covariances and betas "
+                   f"use each holding's last {RISK_WINDOW} trading sessions; drawdowns use the full 5 years.")
+        metric_columns = st.columns(len(summary) - 1)
+        for column, (label, value) in zip(metric_columns, summary.drop('Holdings').items()):
+            column.metric(label, "n/a" if pd.isna(value) else f"{value:.2f}")
+        if len(risk.correlation) > 1:
+            st.pyplot(correlation_heatmap(risk.correlation))
+            col_corr, col_cov = st.columns(2)
+            col_corr.download_button("Download correlation matrix (CSV)", risk.correlation.to_csv(), "correlation.csv", "text/csv")
+            col_cov.download_button("Download covariance matrix (CSV)", risk.covariance.to_csv(), "covariance.csv", "text/csv")
+        if not risk.book.empty:
+            st.write("**Equal-weight book drawdown**")
+            st.line_chart(risk.book['Drawdown'])
 
     # Add interactivity for chart pattern analysis
     st.markdown("### Click below to analyze chart pattern for a stock")
@@ -208,19 +187,26 @@ if uploaded_file is not None:
     if selected_ticker:
         row = df_portfolio[df_portfolio['Ticker'] == selected_ticker]
         if not row.empty:
-            exchange = row['Exchange'].iloc[0].upper()
-            yf_ticker = f"{selected_ticker}.NS" if exchange == "NSE" else f"{selected_ticker}.BO"
-            data = yf.download(yf_ticker, period='1y')  # Changed to 1 year
+            yf_ticker = resolve_symbol(selected_ticker, row['Exchange'].iloc[0])
+            # Reuse the shared history (mapped, not copied) and the portfolio-wide pattern scan
+            history = get_shared_store().columnar.histories([yf_ticker]).get(yf_ticker)
+            data = slice_period(history, '1y') if history is not None else pd.DataFrame()
             if not data.empty and 'Close' in data and not data['Close'].dropna().empty:
                 close_prices = data['Close'].dropna()
-                close_prices = close_prices.reset_index()
-                close_prices.columns = ['Date', 'Close']
-                close_prices = close_prices.set_index('Date')
-                #st.write(f"Data points available: {len(close_prices)}")
-                pattern, recommendation = detect_chart_pattern(close_prices['Close'])
+                pattern, recommendation = patterns.get(yf_ticker, NO_PATTERN)[:2]
                 st.write(f"**Detected Pattern:** {pattern}")
                 st.write(f"**Recommendation:** {recommendation.upper()}")
-                st.line_chart(close_prices['Close'])
+                # Same detectors on weekly and monthly bars, from the results table. The
+                # pattern's own recommendation goes next to it; the timeframe's
+                # indicator vote is shown separately.
+                selected_row = results_df[results_df['Ticker'] == selected_ticker].iloc[0]
+                for timeframe in TIMEFRAMES:
+                    timeframe_pattern = selected_row.get(f'Pattern ({timeframe})')
+                    timeframe_vote = selected_row.get(f'Recommendation ({timeframe})')
+                    st.write(f"**{timeframe} Pattern:** {timeframe_pattern} "
+                             f"({PATTERN_RECOMMENDATIONS.get(timeframe_pattern, 'hold').upper()})")
+                    st.write(f"**{timeframe} Indicator Recommendation:** {timeframe_vote}")
+                st.line_chart(close_prices)
             else:
                 st.warning("No price data available for this ticker.")
         else:
@@ -0,0 +1,357 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from contextlib import nullcontext
+
+import pandas as pd
+
+from fetch_engine import FetchEngine
+from fundamentals_cache import FundamentalsCache
+from incremental import RowResult, portfolio_keys
+from indicators import align_panel, latest_indicators, score_recommendations
+from market_data import resolve_symbol, slice_period
+from pattern_scan import NO_PATTERN, DetectionError, pattern_series, scan_patterns
+from price_cache import PriceCache
+from price_levels import LevelStore
+from profiling import profiler
+from result_table import STATUS_ERROR, STATUS_NO_DATA, STATUS_OK, ResultTable, failed_row
+from risk import BENCHMARKS, RISK_COLUMNS, portfolio_risk, risk_rows
+from timeframes import TIMEFRAME_COLUMNS, higher_timeframe_rows
+
+
+DEFAULT_CHUNK_SIZE = 200
+
+
+# ==================
+# DATA ACCESS
+# ==================
+class DataStore:
+    # Reads straight through the on-disk price and fundamentals caches without
+    # holding results in memory, which keeps long batch runs bounded.
+    def __init__(self, price_cache, fundamentals_cache, columnar=None):
+        self.price_cache = price_cache
+        self.fundamentals_cache = fundamentals_cache
+        self.columnar = columnar
+
+    def histories(self, symbols):
+        return self.price_cache.get_histories(symbols)
+
+    def fundamentals(self, symbols):
+        return self.fundamentals_cache.get_many(symbols)
+
+    # {symbol: message} for symbols whose history could not be downloaded
+    def fetch_errors(self, symbols):
+        return {s: self.price_cache.errors[s] for s in symbols if s in self.price_cache.errors}
+
+
+def default_store(engine=None):
+    engine = engine or FetchEngine()
+    return DataStore(
+        PriceCache(fetcher=engine.histories, period='5y'),
+        FundamentalsCache(fetch_infos=engine.infos),
+    )
+
+
+# ==================
+# PIPELINE
+# ==================
+# Analyze (Ticker, Exchange) rows with one batched fetch, indicator pass and pattern scan.
+# `store` provides histories(symbols), fundamentals(symbols) and fetch_errors(symbols).
+# `bar_store` optionally keeps weekly/monthly bars and `level_store` next-resistance
+# level indexes between calls. Returns {key: RowResult}.
+def analyze_rows(keys, store, bar_store=None, level_store=None):
+    # Resolve every symbol up front and pull 5y history for all rows,
+    # served from the local cache and topped up with only the missing days
+    symbols = [resolve_symbol(t, e) for t, e in keys]
+    with profiler.span('histories'):
+        histories = store.histories(symbols)
+        fetch_errors = store.fetch_errors(symbols)
+    with profiler.span('fundamentals'):
+        infos = store.fundamentals(symbols)
+
+    # Indicators and recommendation scores for every ticker at once, on the 1y window
+    with profiler.span('indicators'):
+        windows = {symbol: slice_period(history, '1y') for symbol, history in histories.items()}
+        latest = latest_indicators(align_panel(windows, 'Close'), align_panel(windows, 'Volume'))
+        _, _, recommendations = score_recommendations(
+            latest['RSI'], latest['MACD'], latest['MACD Signal'],
+            latest['Current Price'], latest['MA50'], latest['OBV Momentum'],
+        )
+
+    # Chart patterns for every holding on the same 1y window, with volume confirmation.
+    # Windows served from the columnar store are read by the workers in place, with
+    # the store's generation pinned until the scan is done.
+    with profiler.span('patterns'):
+        buffers = store.columnar.pattern_buffers(windows) if store.columnar is not None else None
+        with buffers or nullcontext():
+            patterns = scan_patterns(pattern_series(windows), buffers=buffers)
+
+    # Weekly and monthly indicators and patterns, resampled from the same 5y daily series
+    with profiler.span('timeframes'):
+        higher = higher_timeframe_rows(histories, bar_store)
+    level_store = level_store or LevelStore()
+
+    results = {}
+    for key, yf_ticker in zip(keys, symbols):
+        ticker, exchange = key
+        if yf_ticker is None:
+            results[key] = failed_row(ticker, STATUS_ERROR, f"Unknown exchange: {exchange}")
+            continue
+
+        try:
+            # 5 years for next resistance, the 1 year indicator window is sliced from it
+            data_5y = histories.get(yf_ticker, pd.DataFrame())
+            data = slice_period(data_5y, '1y')
+
+            if data.empty or data_5y.empty:
+                if yf_ticker in fetch_errors:
+                    results[key] = failed_row(ticker, STATUS_ERROR, fetch_errors[yf_ticker])
+                else:
+                    results[key] = failed_row(ticker, STATUS_NO_DATA)
+                continue
+
+            # A failed pattern scan keeps the row; the reason goes in 'Error'
+            pattern = patterns.get(yf_ticker, NO_PATTERN)
+            pattern_error = pattern.error if isinstance(pattern, DetectionError) else None
+
+            indicators = latest.loc[yf_ticker]
+            rsi = indicators['RSI']
+            macd = indicators['MACD']
+            macd_signal = indicators['MACD Signal']
+            obv_momentum = indicators['OBV Momentum']
+            ma50 = indicators['MA50']
+            ma200 = indicators['MA200']
+            last_close = indicators['Current Price']
+            support = indicators['Support (20d)']
+            resistance = indicators['Resistance (20d)']
+
+            # Get full name and PE ratio
+            info = infos.get(yf_ticker, {})
+            if exchange.upper() == "BSE":
+                name = info.get('longName') or info.get('shortName')
+            else:
+                name = info.get("longName", "")
+            pe_ratio = info.get('trailingPE', float('nan'))
+
+            # Next resistance above current resistance (from 5y data)
+            with profiler.span('next_resistance', yf_ticker):
+                next_resistance = level_store.get(yf_ticker, data_5y).next_above(resistance, '5y')
+
+            # Recommendation from the vectorized scoring system
+            rec = recommendations[yf_ticker]
+
+            results[key] = {
+                'Ticker': ticker,
+                'Name': name,
+                'RSI': round(rsi, 2),
+                'MACD': round(macd, 2),
+                'MACD Signal': round(macd_signal, 2),
+                'OBV Momentum': round(obv_momentum, 2) if pd.notna(obv_momentum) else float('nan'),
+                'MA50': round(ma50, 2) if pd.notna(ma50) else float('nan'),
+                'MA200': round(ma200, 2) if pd.notna(ma200) else float('nan'),
+                'Current Price': round(last_close, 2),
+                'Support (20d)': round(support, 2) if pd.notna(support) else float('nan'),
+                'Resistance (20d)': round(resistance, 2) if pd.notna(resistance) else float('nan'),
+                'Next Resistance (5y)': round(next_resistance, 2) if pd.notna(next_resistance) else float('nan'),
+                'PE Ratio': round(pe_ratio, 2) if pd.notna(pe_ratio) else float('nan'),
+                'Pattern': pattern[0],
+                'Recommendation': rec,
+                **{column: higher.get(yf_ticker, {}).get(column, float('nan')) for column in TIMEFRAME_COLUMNS},
+                'Status': STATUS_OK,
+                'Error': pattern_error,
+            }
+        except Exception as e:
+            results[key] = failed_row(ticker, STATUS_ERROR, str(e))
+
+    return {
+        key: RowResult(results[key], symbol, windows.get(symbol), patterns.get(symbol, NO_PATTERN))
+        for key, symbol in zip(keys, symbols)
+    }
+
+
+# Typed columnar table for a batch of results, in RESULT_COLUMNS order
+def results_table(row_results):
+    return ResultTable.from_rows([r.row for r in row_results])
+
+
+def results_frame(row_results):
+    return results_table(row_results).to_frame()
+
+
+# ==================
+# PORTFOLIO RISK
+# ==================
+# Volatility, drawdowns and beta against the market indices for every analyzed
+# holding, from one portfolio_risk pass over the whole set. The per-holding
+# values are filled into the RISK_COLUMNS of `table` (whose rows line up with
+# `row_results`) rather than cached with each row, since the set changes
+# between runs. A `risk` already computed for analyzed_symbols(...) is used as
+# is. Returns the PortfolioRisk.
+def add_risk_columns(table, row_results, store, risk=None):
+    if risk is None:
+        risk = holdings_risk(analyzed_symbols(table, [r.symbol for r in row_results]), store)
+    rows = risk_rows(risk)
+
+    for i, (result, status) in enumerate(zip(row_results, table.columns['Status'])):
+        if status != STATUS_OK:
+            continue
+        for column in RISK_COLUMNS:
+            table.columns[column][i] = rows.get(result.symbol, {}).get(column, float('nan'))
+    return risk
+
+
+# Symbols of the analyzed rows of `table`, in row order without repeats.
+# `symbols` lines up with the table's rows.
+def analyzed_symbols(table, symbols):
+    return tuple(dict.fromkeys(s for s, status in zip(symbols, table.columns['Status']) if status == STATUS_OK))
+
+
+def holdings_risk(symbols, store):
+    with profiler.span('risk'):
+        return portfolio_risk(store.histories(list(symbols)), store.histories(list(BENCHMARKS.values())))
+
+
+# ==================
+# STREAMING OUTPUT
+# ==================
+class CsvResultWriter:
+    # Appends each chunk to one CSV file. `position` is the file size after the
+    # last committed chunk, so a resumed run can drop a partially written chunk.
+    def __init__(self, path):
+        self.path = path
+
+    def position(self):
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def rewind(self, position):
+        if position == 0:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        with open(self.path, 'r+b') as f:
+            f.truncate(position)
+
+    def write(self, frame, chunk_index):
+        frame.to_csv(self.path, mode='a', header=self.position() == 0, index=False)
+
+
+class ParquetResultWriter:
+    # Writes each chunk as its own part file inside the output directory, which
+    # pandas/pyarrow read back as a single dataset. `position` counts part files.
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _parts(self):
+        return sorted(name for name in os.listdir(self.path) if name.startswith('part-') and name.endswith('.parquet'))
+
+    def position(self):
+        return len(self._parts())
+
+    def rewind(self, position):
+        for name in self._parts()[position:]:
+            os.remove(os.path.join(self.path, name))
+
+    def write(self, frame, chunk_index):
+        frame.to_parquet(os.path.join(self.path, f"part-{chunk_index:05d}.parquet"), index=False)
+
+
+def result_writer(path):
+    if path.endswith('.parquet'):
+        return ParquetResultWriter(path)
+    return CsvResultWriter(path)
+
+
+# ==================
+# BATCH SCAN
+# ==================
+def _read_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_checkpoint(path, state):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def _universe_digest(keys):
+    return hashlib.sha256(json.dumps(keys).encode()).hexdigest()
+
+
+# Run the pipeline over `keys` in chunks, streaming each chunk to `writer`.
+# After every chunk the checkpoint records how far the run got, so an
+# interrupted scan resumes at the next chunk. Yields a progress dict per chunk.
+def scan_universe(keys, store, writer, chunk_size=DEFAULT_CHUNK_SIZE, checkpoint_path=None):
+    digest = _universe_digest(keys)
+    state = _read_checkpoint(checkpoint_path)
+    if state is None or state.get('universe') != digest:
+        state = {'universe': digest, 'rows_done': 0, 'chunks_done': 0, 'position': 0}
+    writer.rewind(state['position'])
+
+    total = len(keys)
+    started = time.monotonic()
+    resumed_from = state['rows_done']
+
+    for start in range(state['rows_done'], total, chunk_size):
+        chunk = keys[start:start + chunk_size]
+        results = analyze_rows(list(dict.fromkeys(chunk)), store)
+        row_results = [results[key] for key in chunk]
+        table = results_table(row_results)
+        add_risk_columns(table, row_results, store)
+        writer.write(table.to_frame(), state['chunks_done'])
+
+        state['rows_done'] = start + len(chunk)
+        state['chunks_done'] += 1
+        state['position'] = writer.position()
+        if checkpoint_path:
+            _write_checkpoint(checkpoint_path, state)
+
+        elapsed = time.monotonic() - started
+        rate = (state['rows_done'] - resumed_from) / elapsed if elapsed > 0 else 0.0
+        yield {
+            'rows_done': state['rows_done'],
+            'total': total,
+            'chunks_done': state['chunks_done'],
+            'rows_per_second': rate,
+            'eta_seconds': (total - state['rows_done']) / rate if rate > 0 else float('nan'),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scan a Ticker/Exchange universe and stream technical analysis results.")
+    parser.add_argument("universe", help="CSV with 'Ticker' and 'Exchange' columns")
+    parser.add_argument("--output", "-o", required=True, help="Output .csv file or .parquet directory")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows analyzed per batch")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <output>.checkpoint.json)")
+    parser.add_argument("--restart", action="store_true", help="Ignore any existing checkpoint")
+    args = parser.parse_args(argv)
+
+    universe = pd.read_csv(args.universe)
+    if 'Ticker' not in universe.columns or 'Exchange' not in universe.columns:
+        parser.error("universe CSV must have 'Ticker' and 'Exchange' columns")
+
+    checkpoint_path = args.checkpoint or f"{args.output.rstrip(os.sep)}.checkpoint.json"
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    keys = portfolio_keys(universe)
+    writer = result_writer(args.output)
+    for progress in scan_universe(keys, default_store(), writer, args.chunk_size, checkpoint_path):
+        print(
+            f"[chunk {progress['chunks_done']}] {progress['rows_done']}/{progress['total']} rows, "
+            f"{progress['rows_per_second']:.1f} rows/s, ETA {progress['eta_seconds']:.0f}s",
+            file=sys.stderr,
+        )
+    print(f"Wrote {len(keys)} rows to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
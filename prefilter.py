@@ -0,0 +1,157 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from scipy.ndimage import maximum_filter1d, minimum_filter1d
+
+from chart_patterns import PATTERN_SCANNERS
+from profiling import profiler
+
+
+# Limits mirrored from the detector rules in chart_patterns.py / fast_patterns.py
+CUP_WINDOW = 30
+HANDLE_WINDOW = 10
+MAX_PIVOT_GAP = 20        # head & shoulders pivots are fewer than 20 bars apart
+MIN_EXTREMA_GAP = 10      # double/triple top extrema are at least 10 bars apart
+TRIANGLE_MIN_BARS = 30
+
+# `candidates` maps symbol -> frozenset of pattern names that survived the
+# screen; `stats` has one row per (pattern, stage) with how many symbols
+# were checked, pruned and kept
+PatternScreen = namedtuple("PatternScreen", ["candidates", "stats"])
+
+STATS_COLUMNS = ['Pattern', 'Stage', 'Checked', 'Pruned', 'Remaining']
+
+
+# Pack {symbol: (close, volume)} into the compact (bars x symbols) layout used
+# by indicators.compact_panel: each column is one series, bottom-aligned with
+# leading NaNs
+def compact_closes(series):
+    symbols = list(series)
+    lengths = np.array([len(close) for close, _ in series.values()], dtype=np.intp)
+    bars = int(lengths.max()) if len(lengths) else 0
+    closes = np.full((bars, len(symbols)), np.nan)
+    for column, (close, _) in enumerate(series.values()):
+        if len(close):
+            closes[bars - len(close):, column] = close
+    return symbols, closes, lengths
+
+
+# Upper bound on the peaks scipy's find_peaks reports per column: every peak
+# (including a flat-topped one) starts at a bar that rose from the bar before
+# and does not rise into the next one. Leading NaNs never compare true.
+def _extrema_bounds(closes):
+    before, bar, after = closes[:-2], closes[1:-1], closes[2:]
+    peaks = ((before < bar) & (bar >= after)).sum(axis=0)
+    valleys = ((before > bar) & (bar <= after)).sum(axis=0)
+    return peaks, valleys
+
+
+# Max (or min) over the `size` bars ending at each row, for every column in one
+# C pass. Leading NaNs are filled so they never win, which makes a partial
+# window at the start of a series cover just its valid bars.
+def _trailing(closes, size, highest=True):
+    fill = -np.inf if highest else np.inf
+    values = np.where(np.isnan(closes), fill, closes)
+    extreme = maximum_filter1d if highest else minimum_filter1d
+    return extreme(values, size, axis=0, mode='constant', cval=fill, origin=(size - 1) // 2)
+
+
+# ==================
+# SCREENING STAGES
+# ==================
+# Necessary conditions for every detector, each a boolean per column. A pruned
+# pattern could not have been detected, so screening never changes results.
+def _stages(closes, lengths):
+    bars = len(closes)
+    if bars < 3:
+        closes = np.full((3, len(lengths)), np.nan)
+        bars = 0
+    peaks, valleys = _extrema_bounds(closes)
+
+    # Head & shoulders fit within 2 * MAX_PIVOT_GAP - 1 bars, so the head's 10%
+    # prominence must show up as a range within one such window
+    span = 2 * MAX_PIVOT_GAP - 1
+    span_high, span_low = _trailing(closes, span), _trailing(closes, span, highest=False)
+    head_room = (span_high >= span_low * 1.10).any(axis=0)
+    inverted_head_room = (span_low <= span_high * 0.90).any(axis=0)
+
+    # The cup's 30-50% retracement rule on every candidate bottom of every
+    # column: at least CUP_WINDOW bars into the series and far enough from the
+    # end for a handle
+    left_max = np.roll(_trailing(closes, CUP_WINDOW), 1, axis=0)
+    cup_min = _trailing(closes, CUP_WINDOW + 1, highest=False)
+    rows = np.arange(len(closes))[:, None]
+    bottoms = (rows >= bars - lengths + CUP_WINDOW) & (rows < bars - HANDLE_WINDOW - 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        retracement = (left_max - cup_min) / left_max
+    cup_depth = (bottoms & (0.3 <= retracement) & (retracement <= 0.5)).any(axis=0)
+
+    # The symmetrical triangle confirms on a last close beyond the window's range
+    last = closes[-1]
+    high = np.max(closes, axis=0, initial=-np.inf, where=~np.isnan(closes))
+    low = np.min(closes, axis=0, initial=np.inf, where=~np.isnan(closes))
+    breakout = (last > high * 1.02) | (last < low * 0.98)
+
+    return {
+        "Cup and Handle": [
+            ('length', lengths > CUP_WINDOW + HANDLE_WINDOW + 1),
+            ('retracement', cup_depth),
+        ],
+        "Head & Shoulders": [
+            ('extrema', (peaks >= 3) & (valleys >= 2)),
+            ('prominence', head_room),
+        ],
+        "Inverted Head & Shoulders": [
+            ('extrema', (valleys >= 3) & (peaks >= 2)),
+            ('prominence', inverted_head_room),
+        ],
+        "Double Top": [
+            ('extrema', peaks >= 2),
+            ('length', lengths - 2 > MIN_EXTREMA_GAP),
+        ],
+        "Double Bottom": [
+            ('extrema', valleys >= 2),
+            ('length', lengths - 2 > MIN_EXTREMA_GAP),
+        ],
+        "Triple Top": [
+            ('extrema', peaks >= 3),
+            ('length', lengths - 2 > 2 * MIN_EXTREMA_GAP),
+        ],
+        "Triple Bottom": [
+            ('extrema', valleys >= 3),
+            ('length', lengths - 2 > 2 * MIN_EXTREMA_GAP),
+        ],
+        "Symmetrical Triangle": [
+            ('extrema', (peaks >= 3) & (valleys >= 3)),
+            ('length', lengths >= TRIANGLE_MIN_BARS),
+            ('breakout', breakout),
+        ],
+    }
+
+
+# Screen every series at once. Returns a PatternScreen; each pruned count is
+# also recorded as a prefilter.<pattern>.<stage> profiler counter.
+def screen_patterns(series):
+    symbols, closes, lengths = compact_closes(series)
+    stages = _stages(closes, lengths)
+
+    alive = {}
+    rows = []
+    for name, _ in PATTERN_SCANNERS:
+        mask = np.ones(len(symbols), dtype=bool)
+        for stage, passed in stages[name]:
+            checked = int(mask.sum())
+            mask &= passed
+            remaining = int(mask.sum())
+            rows.append({'Pattern': name, 'Stage': stage, 'Checked': checked,
+                         'Pruned': checked - remaining, 'Remaining': remaining})
+            profiler.count(f"prefilter.{name}.{stage}", checked - remaining)
+        alive[name] = mask
+
+    candidates = {
+        symbol: frozenset(name for name, _ in PATTERN_SCANNERS if alive[name][column])
+        for column, symbol in enumerate(symbols)
+    }
+    profiler.count("prefilter.skipped", sum(not names for names in candidates.values()))
+    return PatternScreen(candidates, pd.DataFrame(rows, columns=STATS_COLUMNS))
@@ -0,0 +1,246 @@
+import argparse
+import os
+import time as _time
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+from market_data import fetch_price_history, slice_period
+from profiling import profiler
+
+
+CACHE_DIR = os.environ.get("PFANALYZER_CACHE_DIR", ".price_cache")
+
+# NSE and BSE share the same cash market session
+EXCHANGE_TZ = ZoneInfo("Asia/Kolkata")
+MARKET_OPEN = time(9, 15)
+MARKET_CLOSE = time(15, 30)
+# Daily bars are treated as final a little after the close
+SETTLEMENT_DELAY = timedelta(minutes=30)
+# How stale the still-forming bar may get while the market is open
+INTRADAY_MAX_AGE = timedelta(minutes=15)
+
+
+# ==================
+# FRESHNESS POLICY
+# ==================
+def _to_exchange_time(now=None):
+    if now is None:
+        return datetime.now(EXCHANGE_TZ)
+    if now.tzinfo is None:
+        return now.replace(tzinfo=EXCHANGE_TZ)
+    return now.astimezone(EXCHANGE_TZ)
+
+
+def is_trading_day(day, holidays=()):
+    return day.weekday() < 5 and day not in holidays
+
+
+def session_end(day):
+    return datetime.combine(day, MARKET_CLOSE, EXCHANGE_TZ) + SETTLEMENT_DELAY
+
+
+def is_market_open(now=None, holidays=()):
+    now = _to_exchange_time(now)
+    if not is_trading_day(now.date(), holidays):
+        return False
+    start = datetime.combine(now.date(), MARKET_OPEN, EXCHANGE_TZ)
+    return start <= now < session_end(now.date())
+
+
+# Most recent trading day whose session (including settlement) has finished
+def last_completed_session(now=None, holidays=()):
+    now = _to_exchange_time(now)
+    day = now.date()
+    if now < session_end(day):
+        day -= timedelta(days=1)
+    while not is_trading_day(day, holidays):
+        day -= timedelta(days=1)
+    return day
+
+
+# A stored history is fresh if it was fetched after the last completed session
+# ended, or recently enough while the market is open. Exchange holidays need no
+# special casing: a fetch made after the expected session simply finds no new bar.
+def is_fresh(fetched_at, now=None, holidays=()):
+    if fetched_at is None:
+        return False
+    now = _to_exchange_time(now)
+    fetched_at = _to_exchange_time(fetched_at)
+    if is_market_open(now, holidays):
+        return now - fetched_at <= INTRADAY_MAX_AGE
+    return fetched_at >= session_end(last_completed_session(now, holidays))
+
+
+# Identifies the market data a result is based on: the current intraday bucket
+# while the market is open, otherwise the last completed session date
+def data_version(now=None, holidays=()):
+    now = _to_exchange_time(now)
+    if is_market_open(now, holidays):
+        bucket = int(INTRADAY_MAX_AGE.total_seconds() // 60)
+        return now.replace(minute=now.minute - now.minute % bucket, second=0, microsecond=0).isoformat()
+    return last_completed_session(now, holidays).isoformat()
+
+
+# ==================
+# PRICE STORE
+# ==================
+class PriceCache:
+    # One Parquet file per symbol. The file modification time records when the
+    # symbol was last synced with the data source. `errors` keeps the reason
+    # the last full download failed for symbols that have nothing cached.
+    def __init__(self, root=CACHE_DIR, fetcher=fetch_price_history, period='5y', holidays=()):
+        self.root = root
+        self.fetcher = fetcher
+        self.period = period
+        self.holidays = holidays
+        self.errors = {}
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, symbol):
+        return os.path.join(self.root, f"{symbol}.parquet")
+
+    def load(self, symbol):
+        path = self.path(symbol)
+        if not os.path.exists(path):
+            return None
+        return pd.read_parquet(path)
+
+    def fetched_at(self, symbol):
+        path = self.path(symbol)
+        if not os.path.exists(path):
+            return None
+        return datetime.fromtimestamp(os.path.getmtime(path), EXCHANGE_TZ)
+
+    def save(self, symbol, history):
+        path = self.path(symbol)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        history.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+
+    def touch(self, symbol):
+        os.utime(self.path(symbol))
+
+    # Serve histories from disk, fetching only what is missing or stale
+    def get_histories(self, symbols, now=None):
+        symbols = list(dict.fromkeys(s for s in symbols if s))
+        histories = {}
+        missing = []
+        stale = {}
+
+        for symbol in symbols:
+            stored = self.load(symbol)
+            if stored is None or stored.empty:
+                missing.append(symbol)
+            elif is_fresh(self.fetched_at(symbol), now, self.holidays):
+                histories[symbol] = stored
+            else:
+                stale[symbol] = stored
+        profiler.count('price_cache.hit', len(histories))
+        profiler.count('price_cache.miss', len(missing))
+        profiler.count('price_cache.stale', len(stale))
+
+        # Full download for symbols we have never seen. If the source is
+        # unreachable, serve what is cached and record why the rest is missing:
+        # either the whole request raised or the fetcher reported per-symbol
+        # failures (FetchedHistories.errors).
+        if missing:
+            try:
+                downloaded = self.fetcher(missing, period=self.period)
+                failures = getattr(downloaded, 'errors', {})
+            except Exception as e:
+                downloaded = {}
+                failures = {symbol: str(e) for symbol in missing}
+            for symbol, history in downloaded.items():
+                self.save(symbol, history)
+                histories[symbol] = history
+            for symbol in missing:
+                if symbol in failures and symbol not in downloaded:
+                    self.errors[symbol] = failures[symbol]
+                else:
+                    self.errors.pop(symbol, None)
+            profiler.count('price_cache.errors', len(set(failures) - set(downloaded)))
+
+        # Delta download for stale symbols, batched by their last stored date.
+        # The last stored bar is re-fetched as it may have been a partial session.
+        by_start = {}
+        for symbol, stored in stale.items():
+            by_start.setdefault(stored.index[-1], []).append(symbol)
+
+        for start, group in by_start.items():
+            try:
+                deltas = self.fetcher(group, start=start.strftime('%Y-%m-%d'))
+            except Exception:
+                deltas = {}
+            for symbol in group:
+                stored = stale[symbol]
+                delta = deltas.get(symbol)
+                if delta is None or delta.empty:
+                    # Nothing new (or the source is unreachable); keep serving what we have
+                    if symbol in deltas:
+                        self.touch(symbol)
+                    histories[symbol] = stored
+                    continue
+                merged = pd.concat([stored, delta])
+                merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+                merged = slice_period(merged, self.period)
+                self.save(symbol, merged)
+                histories[symbol] = merged
+
+        return histories
+
+    # ==================
+    # MAINTENANCE TOOLS
+    # ==================
+    def symbols(self):
+        return sorted(name[:-len('.parquet')] for name in os.listdir(self.root) if name.endswith('.parquet'))
+
+    def inspect(self, now=None):
+        rows = []
+        for symbol in self.symbols():
+            history = self.load(symbol)
+            fetched_at = self.fetched_at(symbol)
+            rows.append({
+                'Symbol': symbol,
+                'Rows': len(history),
+                'First Date': history.index[0] if len(history) else None,
+                'Last Date': history.index[-1] if len(history) else None,
+                'Fetched At': fetched_at,
+                'Fresh': is_fresh(fetched_at, now, self.holidays),
+                'Size (KB)': round(os.path.getsize(self.path(symbol)) / 1024, 1),
+            })
+        return pd.DataFrame(rows)
+
+    # Remove the given symbols, or every symbol not synced within `older_than`
+    def evict(self, symbols=None, older_than=None):
+        candidates = self.symbols() if symbols is None else [s for s in symbols if os.path.exists(self.path(s))]
+        evicted = []
+        for symbol in candidates:
+            if older_than is not None:
+                age = _time.time() - os.path.getmtime(self.path(symbol))
+                if age < older_than.total_seconds():
+                    continue
+            os.remove(self.path(symbol))
+            evicted.append(symbol)
+        return evicted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or evict entries in the local OHLCV cache.")
+    parser.add_argument("--root", default=CACHE_DIR)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="Show every cached symbol with its date range and freshness")
+    evict_parser = subparsers.add_parser("evict", help="Remove cached symbols")
+    evict_parser.add_argument("symbols", nargs="*", help="Symbols to evict (default: all)")
+    evict_parser.add_argument("--older-than", type=float, metavar="DAYS", help="Only evict entries not synced for DAYS days")
+    args = parser.parse_args()
+
+    cache = PriceCache(args.root)
+    if args.command == "list":
+        table = cache.inspect()
+        print(table.to_string(index=False) if not table.empty else "Cache is empty.")
+    else:
+        older_than = timedelta(days=args.older_than) if args.older_than is not None else None
+        evicted = cache.evict(args.symbols or None, older_than)
+        print(f"Evicted {len(evicted)} symbol(s).")
@@ -0,0 +1,134 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from market_data import slice_period
+from profiling import profiler
+
+
+HORIZONS = ('1y', '3y', '5y')
+
+# Symbols whose level indexes LevelStore keeps before dropping the least recently used
+MAX_STORED_SYMBOLS = 5000
+
+
+class PriceLevelIndex:
+    # Sorted, deduplicated price levels answering "next level above/below X"
+    # with a binary search. Optional per-level volume supports volume filters.
+    def __init__(self, prices, volumes=None):
+        prices = np.asarray(prices, dtype=float)
+        finite = np.isfinite(prices)
+        self.levels, inverse = np.unique(prices[finite], return_inverse=True)
+        self.volumes = None
+        if volumes is not None:
+            volumes = np.nan_to_num(np.asarray(volumes, dtype=float)[finite])
+            self.volumes = np.bincount(inverse, weights=volumes, minlength=len(self.levels))
+        self._filtered = {}
+
+    # Volume profile: bucket the traded volume into `bins` price ranges and keep
+    # the bucket centres carrying at least `min_share` of the total volume.
+    @classmethod
+    def from_volume_profile(cls, prices, volumes, bins=50, min_share=0.02):
+        prices = np.asarray(prices, dtype=float)
+        volumes = np.nan_to_num(np.asarray(volumes, dtype=float))
+        finite = np.isfinite(prices)
+        if not finite.any():
+            return cls([])
+        hist, edges = np.histogram(prices[finite], bins=bins, weights=volumes[finite])
+        centres = (edges[:-1] + edges[1:]) / 2
+        total = hist.sum()
+        keep = hist >= min_share * total if total > 0 else np.zeros(len(hist), dtype=bool)
+        return cls(centres[keep], hist[keep])
+
+    def __len__(self):
+        return len(self.levels)
+
+    def _levels(self, min_volume):
+        if min_volume is None or self.volumes is None:
+            return self.levels
+        if min_volume not in self._filtered:
+            self._filtered[min_volume] = self.levels[self.volumes >= min_volume]
+        return self._filtered[min_volume]
+
+    def next_above(self, price, min_volume=None):
+        levels = self._levels(min_volume)
+        i = np.searchsorted(levels, price, side='right')
+        return levels[i] if i < len(levels) else float('nan')
+
+    def next_below(self, price, min_volume=None):
+        levels = self._levels(min_volume)
+        i = np.searchsorted(levels, price, side='left') - 1
+        return levels[i] if i >= 0 else float('nan')
+
+
+class PriceLevels:
+    # Per-symbol level indexes for several lookback horizons, all sliced from
+    # one cached OHLCV history. Indexes are built on first use.
+    def __init__(self, history, horizons=HORIZONS):
+        self.history = history
+        self.horizons = horizons
+        self._indexes = {}
+        self._profiles = {}
+
+    def _window(self, horizon):
+        if horizon not in self.horizons:
+            raise ValueError(f"Unsupported horizon: {horizon}")
+        return slice_period(self.history, horizon)
+
+    def index(self, horizon='5y'):
+        if horizon not in self._indexes:
+            window = self._window(horizon)
+            volumes = window['Volume'] if 'Volume' in window else None
+            self._indexes[horizon] = PriceLevelIndex(window['Close'], volumes)
+        return self._indexes[horizon]
+
+    def volume_profile(self, horizon='5y', bins=50, min_share=0.02):
+        key = (horizon, bins, min_share)
+        if key not in self._profiles:
+            window = self._window(horizon)
+            self._profiles[key] = PriceLevelIndex.from_volume_profile(window['Close'], window['Volume'], bins, min_share)
+        return self._profiles[key]
+
+    def next_above(self, price, horizon='5y'):
+        return self.index(horizon).next_above(price)
+
+    def next_below(self, price, horizon='5y'):
+        return self.index(horizon).next_below(price)
+
+
+# Identifies one version of a cached history: a new bar, a rolled-off head or a
+# revised last close all change it
+def history_version(history):
+    if history.empty:
+        return None
+    return (len(history), history.index[0], history.index[-1], float(history['Close'].iloc[-1]))
+
+
+class LevelStore:
+    # Process-wide PriceLevels keyed by symbol, kept while the symbol's history
+    # version is unchanged, so the sorted level indexes are built once per data
+    # version and reused across rows, reruns and horizons. The least recently
+    # used symbols are dropped beyond `max_symbols`.
+    def __init__(self, max_symbols=MAX_STORED_SYMBOLS):
+        self.max_symbols = max_symbols
+        self._levels = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, symbol, history):
+        version = history_version(history)
+        with self._lock:
+            entry = self._levels.get(symbol)
+            if entry is not None and entry[0] == version:
+                self._levels.move_to_end(symbol)
+                profiler.count('level_store.hit')
+                return entry[1]
+
+        profiler.count('level_store.miss')
+        levels = PriceLevels(history)
+        with self._lock:
+            self._levels[symbol] = (version, levels)
+            self._levels.move_to_end(symbol)
+            while len(self._levels) > self.max_symbols:
+                self._levels.popitem(last=False)
+        return levels
@@ -0,0 +1,148 @@
+import json
+import os
+import threading
+import time
+from collections import Counter, namedtuple
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+
+
+# One timed stage. `parent` is the enclosing span's stage and `nested` marks
+# spans inside another span for the same ticker, so per-ticker totals don't
+# count time twice. `start` is wall-clock epoch seconds so spans recorded in
+# worker processes line up with the parent's.
+Span = namedtuple("Span", ["stage", "ticker", "parent", "nested", "start", "duration", "process", "thread"])
+
+SPAN_COLUMNS = list(Span._fields)
+
+# Returned by span() while profiling is off, so disabled call sites cost one
+# attribute check and no allocation
+_NO_SPAN = nullcontext()
+
+
+class Profiler:
+    # Collects timing spans and named counters for the whole process. Off by
+    # default (or via PFANALYZER_PROFILE=1); while off, span() and count() return
+    # immediately.
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._spans = []
+        self._counters = Counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def reset(self):
+        with self._lock:
+            self._spans = []
+            self._counters = Counter()
+
+    # ==================
+    # RECORDING
+    # ==================
+    def span(self, stage, ticker=None):
+        if not self.enabled:
+            return _NO_SPAN
+        return self._timed(stage, ticker)
+
+    @contextmanager
+    def _timed(self, stage, ticker):
+        ticker = ticker if ticker is not None else getattr(self._local, 'ticker', None)
+        stack = self._local.__dict__.setdefault('stack', [])
+        parent = stack[-1] if stack else (None, None)
+        stack.append((stage, ticker))
+        start = time.time()
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - began
+            stack.pop()
+            span = Span(stage, ticker, parent[0], ticker is not None and parent[1] == ticker,
+                        start, duration, os.getpid(), threading.get_ident())
+            with self._lock:
+                self._spans.append(span)
+
+    # Attribute nested spans that don't name a ticker (e.g. each detector inside
+    # detect_chart_pattern) to `ticker`
+    @contextmanager
+    def ticker(self, ticker):
+        if not self.enabled:
+            yield
+            return
+        previous = getattr(self._local, 'ticker', None)
+        self._local.ticker = ticker
+        try:
+            yield
+        finally:
+            self._local.ticker = previous
+
+    def count(self, name, n=1):
+        if not self.enabled or not n:
+            return
+        with self._lock:
+            self._counters[name] += n
+
+    # Hand over everything recorded so far (used to ship worker spans to the parent)
+    def drain(self):
+        with self._lock:
+            spans, counters = self._spans, self._counters
+            self._spans, self._counters = [], Counter()
+        return spans, counters
+
+    def merge(self, spans, counters=None):
+        with self._lock:
+            self._spans.extend(spans)
+            self._counters.update(counters or {})
+
+    # ==================
+    # REPORTING
+    # ==================
+    def spans(self):
+        with self._lock:
+            return pd.DataFrame(list(self._spans), columns=SPAN_COLUMNS)
+
+    def counters(self):
+        with self._lock:
+            return dict(self._counters)
+
+    # Total, mean and max duration per stage, slowest first
+    def stage_summary(self):
+        spans = self.spans()
+        if spans.empty:
+            return pd.DataFrame(columns=['Stage', 'Calls', 'Total (s)', 'Mean (ms)', 'Max (ms)'])
+        grouped = spans.groupby('stage')['duration']
+        summary = pd.DataFrame({
+            'Calls': grouped.size(),
+            'Total (s)': grouped.sum(),
+            'Mean (ms)': grouped.mean() * 1000,
+            'Max (ms)': grouped.max() * 1000,
+        })
+        return summary.sort_values('Total (s)', ascending=False).rename_axis('Stage').reset_index()
+
+    # Time attributed to each ticker across all stages, slowest first
+    def ticker_summary(self, top=20):
+        spans = self.spans().dropna(subset=['ticker'])
+        spans = spans[~spans['nested'].astype(bool)]
+        if spans.empty:
+            return pd.DataFrame(columns=['Ticker', 'Total (s)', 'Slowest Stage'])
+        totals = spans.groupby('ticker')['duration'].sum()
+        slowest = spans.loc[spans.groupby('ticker')['duration'].idxmax()].set_index('ticker')['stage']
+        summary = pd.DataFrame({'Total (s)': totals, 'Slowest Stage': slowest})
+        return summary.sort_values('Total (s)', ascending=False).head(top).rename_axis('Ticker').reset_index()
+
+    def to_json(self):
+        return json.dumps({
+            'spans': self.spans().astype(object).where(lambda frame: frame.notna(), None).to_dict(orient='records'),
+            'counters': self.counters(),
+        }, default=str)
+
+    def to_csv(self):
+        return self.spans().to_csv(index=False)
+
+
+# Process-wide profiler used by every instrumented module
+profiler = Profiler(enabled=os.environ.get("PFANALYZER_PROFILE") == "1")
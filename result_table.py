@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from risk import RISK_COLUMNS
+from timeframes import TIMEFRAME_COLUMNS
+
+
+# Row outcome, kept apart from the values so numeric columns stay numeric
+STATUS_OK = 'OK'
+STATUS_NO_DATA = 'No Data'
+STATUS_ERROR = 'Error'
+STATUSES = [STATUS_OK, STATUS_NO_DATA, STATUS_ERROR]
+
+NUMERIC_COLUMNS = [
+    'RSI', 'MACD', 'MACD Signal', 'OBV Momentum', 'MA50', 'MA200',
+    'Current Price', 'Support (20d)', 'Resistance (20d)', 'Next Resistance (5y)', 'PE Ratio',
+    *(column for column in TIMEFRAME_COLUMNS if column.startswith('RSI')),
+    *RISK_COLUMNS,
+]
+
+RESULT_COLUMNS = [
+    'Ticker', 'Name', 'RSI', 'MACD', 'MACD Signal', 'OBV Momentum', 'MA50', 'MA200',
+    'Current Price', 'Support (20d)', 'Resistance (20d)', 'Next Resistance (5y)',
+    'PE Ratio', 'Pattern', 'Recommendation', *TIMEFRAME_COLUMNS, *RISK_COLUMNS, 'Status', 'Error',
+]
+
+TEXT_COLUMNS = [column for column in RESULT_COLUMNS if column not in NUMERIC_COLUMNS and column != 'Status']
+
+
+# A row for a holding that could not be analyzed: every value missing, the
+# reason in Status/Error
+def failed_row(ticker, status, message=None):
+    row = {column: np.nan for column in NUMERIC_COLUMNS}
+    row.update({column: None for column in TEXT_COLUMNS})
+    row.update({'Ticker': ticker, 'Status': status, 'Error': message})
+    return row
+
+
+class ResultTable:
+    # Preallocated typed columns for `size` result rows: float64 arrays with NaN
+    # for missing numbers, object arrays of str/None for text and a Status
+    # column. Converts to Arrow (what st.dataframe renders) and pandas
+    # without per-cell type inference.
+    def __init__(self, size):
+        self.size = size
+        self.columns = {}
+        for column in RESULT_COLUMNS:
+            if column in NUMERIC_COLUMNS:
+                self.columns[column] = np.full(size, np.nan)
+            else:
+                self.columns[column] = np.full(size, None, dtype=object)
+
+    @classmethod
+    def from_rows(cls, rows):
+        table = cls(len(rows))
+        for i, row in enumerate(rows):
+            table.set_row(i, row)
+        return table
+
+    def set_row(self, i, row):
+        for column, values in self.columns.items():
+            value = row.get(column)
+            if column in NUMERIC_COLUMNS:
+                values[i] = np.nan if value is None else value
+            else:
+                values[i] = None if value is None or value != value else str(value)
+
+    def __len__(self):
+        return self.size
+
+    def to_arrow(self):
+        arrays = {}
+        for column, values in self.columns.items():
+            if column in NUMERIC_COLUMNS:
+                arrays[column] = pa.array(values, type=pa.float64(), from_pandas=True)
+            elif column == 'Status':
+                arrays[column] = pa.DictionaryArray.from_arrays(
+                    pa.array([STATUSES.index(v) if v in STATUSES else None for v in values], type=pa.int8()),
+                    pa.array(STATUSES),
+                )
+            else:
+                arrays[column] = pa.array(values, type=pa.string())
+        return pa.table(arrays)
+
+    def to_frame(self):
+        data = {}
+        for column, values in self.columns.items():
+            if column in NUMERIC_COLUMNS:
+                data[column] = values
+            elif column == 'Status':
+                data[column] = pd.Categorical(values, categories=STATUSES)
+            else:
+                data[column] = pd.array(values, dtype='string')
+        return pd.DataFrame(data, columns=RESULT_COLUMNS, copy=False)
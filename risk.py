@@ -0,0 +1,263 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+
+from indicators import align_panel, compact_panel, expand_panel
+
+
+# Market indices used for beta, by display name
+BENCHMARKS = {
+    'NIFTY 50': '^NSEI',
+    'SENSEX': '^BSESN',
+}
+
+TRADING_DAYS_PER_YEAR = 252
+
+# Each holding's own trailing returns used for covariance, correlation, beta
+# and 1y volatility; drawdowns use the whole 5y history
+RISK_WINDOW = 252
+VOLATILITY_WINDOW = 20
+
+# Pairs (or ticker/benchmark) with fewer overlapping returns get NaN
+MIN_OBSERVATIONS = 60
+
+# Heatmap axes are labelled with tickers up to this many holdings
+MAX_HEATMAP_LABELS = 40
+
+RISK_COLUMNS = [
+    'Volatility 20d (%)', 'Volatility 1y (%)', 'Max Drawdown 5y (%)', 'Drawdown (%)',
+    *(f"Beta ({name})" for name in BENCHMARKS),
+]
+
+# Aligned daily simple returns: float32 (dates x symbols) matrix with NaN where a
+# symbol has no return, plus the labels of both axes
+ReturnsPanel = namedtuple("ReturnsPanel", ["dates", "symbols", "returns"])
+
+# Portfolio-level results: covariance/correlation matrices and betas over each
+# holding's last RISK_WINDOW returns, rolling volatility and drawdown panels over 5y, the
+# equal-weight book's daily return/drawdown and a summary of the book
+PortfolioRisk = namedtuple("PortfolioRisk", [
+    "covariance", "correlation", "betas", "volatility", "drawdown", "book", "summary",
+])
+
+
+# ==================
+# RETURNS PANEL
+# ==================
+# Close-to-close returns for every history, aligned on one date index. Returns
+# are taken in the compact layout, so each one spans a ticker's own consecutive
+# bars even when other exchanges traded on the dates in between.
+def returns_panel(histories):
+    close = align_panel(histories, 'Close')
+    if close.empty:
+        return ReturnsPanel(pd.DatetimeIndex([]), [], np.empty((0, 0), dtype=np.float32)), close
+
+    compact, order = compact_panel(close)
+    returns = np.full_like(compact, np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns[1:] = compact[1:] / compact[:-1] - 1
+    returns = expand_panel(returns, order, close).to_numpy(dtype=np.float32)
+    return ReturnsPanel(close.index, list(close.columns), returns), close
+
+
+# Keep only each column's own last `rows` returns. Windows are counted in the
+# ticker's own bars, so a holding's window never depends on which other
+# symbols (and their extra trading dates) share the panel.
+def _own_window(panel, rows):
+    valid = ~np.isnan(panel.returns)
+    from_end = np.cumsum(valid[::-1], axis=0)[::-1]
+    returns = np.where(from_end <= rows, panel.returns, np.nan).astype(np.float32)
+    return ReturnsPanel(panel.dates, panel.symbols, returns)
+
+
+# ==================
+# PAIRWISE MOMENTS
+# ==================
+# Subtract each column's mean and zero its missing values, so the sums in
+# _pairwise_moments don't cancel in float32 and missing returns drop out
+def _centred(values, valid):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.nansum(values, axis=0) / valid.sum(axis=0)
+    return np.where(valid > 0, values - means, 0).astype(np.float32)
+
+
+# Covariance of every column of `x` with every column of `y` over the dates
+# where both have a return (pandas' pairwise-complete rule), as a handful of
+# float32 matrix products instead of a loop over pairs. Returns (cov, n, var_x,
+# var_y), where var_x/var_y are each side's variance over the same dates.
+def _pairwise_moments(x, y):
+    mx, my = (~np.isnan(x)).astype(np.float32), (~np.isnan(y)).astype(np.float32)
+    x, y = _centred(x, mx), _centred(y, my)
+
+    n = mx.T @ my
+    sum_x, sum_y = x.T @ my, mx.T @ y
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = (x.T @ y - sum_x * sum_y / n) / (n - 1)
+        var_x = ((x * x).T @ my - sum_x * sum_x / n) / (n - 1)
+        var_y = (mx.T @ (y * y) - sum_y * sum_y / n) / (n - 1)
+    thin = n < MIN_OBSERVATIONS
+    for values in (cov, var_x, var_y):
+        values[thin] = np.nan
+    return cov, n, var_x, var_y
+
+
+def covariance_matrix(panel):
+    cov, _, var_x, var_y = _pairwise_moments(panel.returns, panel.returns)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        corr = np.clip(cov / np.sqrt(var_x * var_y), -1.0, 1.0)
+    np.fill_diagonal(corr, np.where(np.isnan(np.diag(cov)), np.nan, 1.0))
+    return (pd.DataFrame(cov.astype(float), index=panel.symbols, columns=panel.symbols),
+            pd.DataFrame(corr.astype(float), index=panel.symbols, columns=panel.symbols))
+
+
+# Beta of every symbol against every benchmark: cov(r, r_b) / var(r_b) over
+# their common dates. `benchmarks` maps display name -> returns column.
+def betas(panel, benchmarks):
+    if not benchmarks:
+        return pd.DataFrame(index=panel.symbols)
+    market = np.column_stack(list(benchmarks.values())).astype(np.float32)
+    cov, _, _, var_market = _pairwise_moments(panel.returns, market)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        beta = cov / var_market
+    return pd.DataFrame(beta.astype(float), index=panel.symbols, columns=list(benchmarks))
+
+
+# ==================
+# ROLLING WINDOWS
+# ==================
+# Annualized standard deviation of each ticker's last `window` returns at every
+# date, taken in the compact layout so a window is the ticker's own bars.
+# Running sums (accumulated in float64) make each window the previous one plus
+# the newest return minus the oldest, so the cost is one pass over the panel
+# whatever the window length.
+def rolling_volatility(panel, window=VOLATILITY_WINDOW):
+    frame = pd.DataFrame(panel.returns, index=panel.dates, columns=panel.symbols)
+    returns, order = compact_panel(frame)
+    valid = ~np.isnan(returns)
+    values = np.where(valid, returns, 0)
+
+    def window_sums(a):
+        sums = np.cumsum(a, axis=0)
+        sums[window:] = sums[window:] - sums[:-window]
+        return sums
+
+    n = window_sums(valid.astype(np.float64))
+    total, squares = window_sums(values), window_sums(values * values)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = (squares - total * total / n) / (n - 1)
+    variance[(n < window) | ~valid] = np.nan
+    volatility = np.sqrt(np.maximum(variance, 0)) * np.sqrt(TRADING_DAYS_PER_YEAR)
+    return expand_panel(volatility, order, frame).astype(np.float32)
+
+
+# Fall from the running peak close at every date, as a fraction (0 at a new high)
+def drawdowns(close):
+    values = close.to_numpy(dtype=float)
+    peaks = np.fmax.accumulate(values, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return pd.DataFrame(values / peaks - 1, index=close.index, columns=close.columns)
+
+
+# Each column's value at its own last valid row
+def _latest(frame):
+    values = frame.to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    rows = len(values) - 1 - np.argmax(valid[::-1], axis=0)
+    latest = values[rows, np.arange(values.shape[1])] if len(values) else np.full(values.shape[1], np.nan)
+    return pd.Series(np.where(valid.any(axis=0), latest, np.nan), index=frame.columns)
+
+
+# ==================
+# PORTFOLIO RISK
+# ==================
+# Split benchmark columns off a panel that was aligned together with them
+def _split_benchmarks(panel, benchmark_histories):
+    names = {symbol: name for name, symbol in BENCHMARKS.items() if symbol in benchmark_histories}
+    columns = [i for i, symbol in enumerate(panel.symbols) if symbol not in names]
+    market = {names[symbol]: panel.returns[:, i] for i, symbol in enumerate(panel.symbols) if symbol in names}
+    holdings = ReturnsPanel(panel.dates, [panel.symbols[i] for i in columns], panel.returns[:, columns])
+    return holdings, market
+
+
+# Equal-weight book rebalanced daily: each date's mean return over the holdings
+# that traded, and the drawdown of its compounded value. A book with no returns
+# at all has no drawdown either (NaN, not 0).
+def _book(holdings):
+    valid = ~np.isnan(holdings.returns)
+    counts = valid.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns = np.where(valid, holdings.returns, 0).sum(axis=1, dtype=np.float64) / counts
+    returns[counts == 0] = np.nan
+    value = np.cumprod(1 + np.nan_to_num(returns))
+    drawdown = value / np.maximum.accumulate(value) - 1
+    if not counts.any():
+        drawdown = np.full(len(returns), np.nan)
+    return pd.DataFrame({'Return': returns, 'Drawdown': drawdown}, index=holdings.dates)
+
+
+# Risk metrics for every holding from its 5y daily history, plus the
+# portfolio-level matrices. Holdings are aligned with the benchmark indices
+# into one returns panel, so every metric sees the same dates. Per-holding
+# values depend only on that holding (and the indices), never on the rest of
+# the set.
+def portfolio_risk(histories, benchmark_histories=None):
+    benchmark_histories = {symbol: history for symbol, history in (benchmark_histories or {}).items()
+                           if symbol not in histories}
+    panel, close = returns_panel({**histories, **benchmark_histories})
+    holdings, market = _split_benchmarks(panel, benchmark_histories)
+
+    recent = _own_window(holdings, RISK_WINDOW)
+    covariance, correlation = covariance_matrix(recent)
+    beta = betas(recent, market)
+    beta = beta.reindex(columns=list(BENCHMARKS))
+    volatility = rolling_volatility(holdings)
+    drawdown = drawdowns(close[holdings.symbols])
+    book = _book(holdings)
+
+    book_recent = book['Return'].iloc[-RISK_WINDOW:]
+    summary = pd.Series({
+        'Holdings': len(holdings.symbols),
+        'Volatility 1y (%)': book_recent.std() * np.sqrt(TRADING_DAYS_PER_YEAR) * 100,
+        'Max Drawdown 5y (%)': book['Drawdown'].min() * 100,
+        'Drawdown (%)': book['Drawdown'].iloc[-1] * 100 if len(book) else np.nan,
+        # Beta is linear in the weights, so the book's beta is the mean of its holdings'
+        **{f"Beta ({name})": beta[name].mean() for name in BENCHMARKS},
+    }, dtype=float)
+
+    return PortfolioRisk(covariance, correlation, beta, volatility, drawdown, book, summary)
+
+
+# {symbol: {column: value}} with the RISK_COLUMNS for every holding
+def risk_rows(risk):
+    volatility_1y = np.sqrt(np.diag(risk.covariance.to_numpy()) * TRADING_DAYS_PER_YEAR)
+    columns = {
+        'Volatility 20d (%)': _latest(risk.volatility) * 100,
+        'Volatility 1y (%)': pd.Series(volatility_1y, index=risk.covariance.index) * 100,
+        'Max Drawdown 5y (%)': risk.drawdown.min() * 100,
+        'Drawdown (%)': _latest(risk.drawdown) * 100,
+        **{f"Beta ({name})": risk.betas[name] for name in BENCHMARKS},
+    }
+    table = pd.DataFrame(columns, index=risk.covariance.index).round(2)
+    return table.to_dict(orient='index')
+
+
+# Correlation matrix as a blue (-1) to red (+1) heatmap. A Figure rather than
+# pyplot, so concurrent sessions don't share global plotting state.
+def correlation_heatmap(correlation, max_labels=MAX_HEATMAP_LABELS):
+    size = min(4 + 0.25 * len(correlation), 14)
+    figure = Figure(figsize=(size + 1.5, size))
+    axes = figure.subplots()
+    image = axes.imshow(correlation.to_numpy(), cmap='RdBu_r', vmin=-1, vmax=1, interpolation='nearest')
+    figure.colorbar(image, ax=axes, shrink=0.8, label='Correlation')
+    if len(correlation) <= max_labels:
+        ticks = np.arange(len(correlation))
+        axes.set_xticks(ticks, correlation.columns, rotation=90, fontsize=7)
+        axes.set_yticks(ticks, correlation.index, fontsize=7)
+    else:
+        axes.set_xticks([])
+        axes.set_yticks([])
+    axes.set_title(f"Daily return correlation, last {RISK_WINDOW} sessions per holding")
+    figure.tight_layout()
+    return figure
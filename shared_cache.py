@@ -0,0 +1,131 @@
+import threading
+import time
+from datetime import timedelta
+
+from price_cache import data_version
+from profiling import profiler
+
+
+# ==================
+# SINGLE-FLIGHT
+# ==================
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    # Deduplicates concurrent work per key: the first caller runs it, callers
+    # arriving while it is in flight wait for and share the same result.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        return self.do_many([key], lambda keys: {keys[0]: fn()})[key]
+
+    # Batched variant: `fetch(keys)` returns {key: value} for the keys this caller
+    # leads; keys already in flight elsewhere are awaited instead of re-fetched.
+    def do_many(self, keys, fetch):
+        keys = list(dict.fromkeys(keys))
+        with self._lock:
+            leading = [k for k in keys if k not in self._calls]
+            for key in leading:
+                self._calls[key] = _Call()
+            calls = {key: self._calls[key] for key in keys}
+
+        if leading:
+            try:
+                fetched = fetch(leading)
+                for key in leading:
+                    calls[key].result = fetched.get(key)
+            except Exception as e:
+                for key in leading:
+                    calls[key].error = e
+            finally:
+                with self._lock:
+                    for key in leading:
+                        del self._calls[key]
+                for key in leading:
+                    calls[key].event.set()
+
+        results = {}
+        for key, call in calls.items():
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            results[key] = call.result
+        return results
+
+
+# ==================
+# SHARED DATA STORE
+# ==================
+class SharedDataStore:
+    # Process-wide front for the price and fundamentals caches. Results are kept
+    # in memory per version: histories for the current price_cache.data_version,
+    # so they turn over when a new session or intraday bucket starts, and
+    # fundamentals for the current `ttl` bucket. Concurrent sessions asking for
+    # the same symbol trigger a single fetch. With a `columnar` store, fetched
+    # histories are published there and served as memory-mapped views instead of
+    # pandas copies.
+    def __init__(self, price_cache, fundamentals_cache, ttl=timedelta(minutes=5), columnar=None):
+        self.price_cache = price_cache
+        self.fundamentals_cache = fundamentals_cache
+        self.columnar = columnar
+        self.ttl = ttl.total_seconds()
+        self._histories = {}
+        self._fundamentals = {}
+        self._lock = threading.Lock()
+        self._price_flight = SingleFlight()
+        self._fundamentals_flight = SingleFlight()
+
+    def _cached(self, store, symbols, version):
+        hits = {}
+        with self._lock:
+            for symbol in symbols:
+                entry = store.get(symbol)
+                if entry is not None and entry[0] == version:
+                    hits[symbol] = entry[1]
+        return hits
+
+    def _remember(self, store, values, version):
+        with self._lock:
+            for symbol, value in values.items():
+                if value is not None:
+                    store[symbol] = (version, value)
+
+    def _get(self, store, flight, loader, symbols, name, version):
+        symbols = [s for s in dict.fromkeys(symbols) if s]
+        values = self._cached(store, symbols, version)
+        misses = [s for s in symbols if s not in values]
+        profiler.count(f'shared_store.{name}.hit', len(values))
+        profiler.count(f'shared_store.{name}.miss', len(misses))
+        if misses:
+            loaded = flight.do_many(misses, loader)
+            self._remember(store, loaded, version)
+            values.update({s: v for s, v in loaded.items() if v is not None})
+        return values
+
+    def _load_histories(self, symbols):
+        histories = self.price_cache.get_histories(symbols)
+        if self.columnar is None:
+            return histories
+        self.columnar.publish(histories)
+        mapped = self.columnar.histories(histories)
+        return {symbol: mapped.get(symbol, history) for symbol, history in histories.items()}
+
+    def histories(self, symbols):
+        version = data_version(holidays=self.price_cache.holidays)
+        return self._get(self._histories, self._price_flight, self._load_histories, symbols, 'histories', version)
+
+    # {symbol: message} for symbols whose history could not be downloaded
+    def fetch_errors(self, symbols):
+        return {s: self.price_cache.errors[s] for s in symbols if s in self.price_cache.errors}
+
+    def fundamentals(self, symbols):
+        version = int(time.time() // self.ttl)
+        return self._get(self._fundamentals, self._fundamentals_flight, self.fundamentals_cache.get_many,
+                         symbols, 'fundamentals', version)
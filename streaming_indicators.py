@@ -0,0 +1,246 @@
+import math
+from collections import deque
+
+from indicators import (
+    MA_LONG, MA_SHORT, MACD_FAST, MACD_SIGNAL, MACD_SLOW, MIN_VOTES, OBV_MOMENTUM_PERIODS,
+    RSI_OVERBOUGHT, RSI_OVERSOLD, RSI_WINDOW, SUPPORT_RESISTANCE_WINDOW,
+)
+
+
+# ==================
+# BUILDING BLOCKS
+# ==================
+class _Ewm:
+    # pandas ewm(adjust=False) recurrence; the value is reported once
+    # `min_periods` observations have been seen, like the batch indicators
+    def __init__(self, alpha, min_periods):
+        self.alpha = alpha
+        self.min_periods = min_periods
+        self.value = None
+        self.count = 0
+
+    def push(self, x):
+        self.value = x if self.value is None else (1 - self.alpha) * self.value + self.alpha * x
+        self.count += 1
+
+    def get(self):
+        return self.value if self.count >= self.min_periods else float('nan')
+
+    def state(self):
+        return self.value, self.count
+
+    def restore(self, state):
+        self.value, self.count = state
+
+
+class _RollingWindow:
+    # Fixed-size ring buffer with a running sum. The sum is re-derived from the
+    # buffer once per `size` pushes so floating-point drift stays bounded. With
+    # `extremes`, monotonic deques of (push number, value) keep the window's
+    # min and max at their fronts, so both cost O(1) amortized per push.
+    def __init__(self, size, extremes=False):
+        self.size = size
+        self.values = deque()
+        self.total = 0.0
+        self._evicted = None
+        self._pushes = 0
+        self._extremes = (deque(), deque()) if extremes else None
+        self._displaced = None
+
+    def push(self, x):
+        self.values.append(x)
+        self.total += x
+        self._evicted = self.values.popleft() if len(self.values) > self.size else None
+        if self._evicted is not None:
+            self.total -= self._evicted
+        if self._extremes is not None:
+            self._push_extremes(x)
+        self._pushes += 1
+        if self._pushes % self.size == 0:
+            self.total = math.fsum(self.values)
+
+    # Entries dominated by `x` leave from the back, the entry that slid out of
+    # the window from the front; both are remembered so pop() can restore them
+    def _push_extremes(self, x):
+        self._displaced = []
+        for queue, dominated in zip(self._extremes, (lambda kept: kept >= x, lambda kept: kept <= x)):
+            behind = []
+            while queue and dominated(queue[-1][1]):
+                behind.append(queue.pop())
+            queue.append((self._pushes, x))
+            expired = queue.popleft() if queue[0][0] <= self._pushes - self.size else None
+            self._displaced.append((behind, expired))
+
+    # Undo the most recent push (used to revise the still-forming bar)
+    def pop(self):
+        self.total -= self.values.pop()
+        if self._evicted is not None:
+            self.values.appendleft(self._evicted)
+            self.total += self._evicted
+            self._evicted = None
+        self._pushes -= 1
+        if self._extremes is not None:
+            for queue, (behind, expired) in zip(self._extremes, self._displaced):
+                queue.pop()
+                if expired is not None:
+                    queue.appendleft(expired)
+                queue.extend(reversed(behind))
+            self._displaced = None
+
+    def full(self):
+        return len(self.values) == self.size
+
+    def mean(self):
+        return self.total / self.size if self.full() else float('nan')
+
+    def min(self):
+        if self._extremes is not None:
+            return self._extremes[0][0][1] if self._extremes[0] else float('nan')
+        return min(self.values) if self.values else float('nan')
+
+    def max(self):
+        if self._extremes is not None:
+            return self._extremes[1][0][1] if self._extremes[1] else float('nan')
+        return max(self.values) if self.values else float('nan')
+
+
+# ==================
+# STREAMING INDICATORS
+# ==================
+class StreamingIndicators:
+    # Incremental RSI, MACD/signal, OBV momentum, MA50/MA200, 20-day
+    # support/resistance and the BUY/SELL/HOLD vote for one symbol. Each bar
+    # costs O(1) and the values match indicators.compute_indicators on the
+    # same series. Use `new_bar=False` to revise the still-forming bar as ticks arrive.
+    def __init__(self):
+        self._rsi_up = _Ewm(1 / RSI_WINDOW, RSI_WINDOW)
+        self._rsi_down = _Ewm(1 / RSI_WINDOW, RSI_WINDOW)
+        self._ema_fast = _Ewm(2 / (MACD_FAST + 1), MACD_FAST)
+        self._ema_slow = _Ewm(2 / (MACD_SLOW + 1), MACD_SLOW)
+        self._signal = _Ewm(2 / (MACD_SIGNAL + 1), MACD_SIGNAL)
+        self._ma_short = _RollingWindow(MA_SHORT)
+        self._ma_long = _RollingWindow(MA_LONG)
+        self._range = _RollingWindow(SUPPORT_RESISTANCE_WINDOW, extremes=True)
+        self._obv_history = _RollingWindow(OBV_MOMENTUM_PERIODS + 1)
+        self._prev_close = None
+        self._close = float('nan')
+        self._obv = 0.0
+        self._snapshot = None
+
+    @classmethod
+    def from_history(cls, closes, volumes):
+        indicators = cls()
+        for close, volume in zip(closes, volumes):
+            indicators.update(close, volume)
+        return indicators
+
+    def _scalar_state(self):
+        return (
+            self._rsi_up.state(), self._rsi_down.state(), self._ema_fast.state(),
+            self._ema_slow.state(), self._signal.state(),
+            self._prev_close, self._close, self._obv,
+        )
+
+    def _restore(self, snapshot):
+        (rsi_up, rsi_down, ema_fast, ema_slow, signal,
+         self._prev_close, self._close, self._obv) = snapshot
+        self._rsi_up.restore(rsi_up)
+        self._rsi_down.restore(rsi_down)
+        self._ema_fast.restore(ema_fast)
+        self._ema_slow.restore(ema_slow)
+        self._signal.restore(signal)
+        for window in (self._ma_short, self._ma_long, self._range, self._obv_history):
+            window.pop()
+
+    def update(self, close, volume, new_bar=True):
+        if close is None or close != close:
+            return self.values()
+
+        if not new_bar and self._snapshot is not None:
+            self._restore(self._snapshot)
+        self._snapshot = self._scalar_state()
+
+        # RSI: Wilder smoothing of up/down moves (the first bar counts as no move)
+        diff = close - self._prev_close if self._prev_close is not None else 0.0
+        self._rsi_up.push(diff if diff > 0 else 0.0)
+        self._rsi_down.push(-diff if diff < 0 else 0.0)
+
+        # MACD and its signal line; the signal only starts once MACD is defined
+        self._ema_fast.push(close)
+        self._ema_slow.push(close)
+        if self._ema_slow.count >= MACD_SLOW:
+            self._signal.push(self._ema_fast.value - self._ema_slow.value)
+
+        # On-balance volume; like the batch cumsum, a bar without volume reads as NaN
+        if volume is not None and volume == volume:
+            self._obv += -volume if self._prev_close is not None and close < self._prev_close else volume
+            self._obv_history.push(self._obv)
+        else:
+            self._obv_history.push(float('nan'))
+
+        self._ma_short.push(close)
+        self._ma_long.push(close)
+        self._range.push(close)
+        self._prev_close = close
+        self._close = close
+        return self.values()
+
+    def values(self):
+        ema_fast, ema_slow = self._ema_fast.get(), self._ema_slow.get()
+        down = self._rsi_down.get()
+        if down == 0:
+            rsi = 100.0
+        else:
+            rsi = 100 - (100 / (1 + self._rsi_up.get() / down))
+
+        obv_momentum = float('nan')
+        if self._obv_history.full():
+            obv_momentum = self._obv_history.values[-1] - self._obv_history.values[0]
+
+        values = {
+            'Current Price': self._close,
+            'RSI': rsi,
+            'MACD': ema_fast - ema_slow,
+            'MACD Signal': self._signal.get(),
+            'OBV Momentum': obv_momentum,
+            'MA50': self._ma_short.mean(),
+            'MA200': self._ma_long.mean(),
+            'Support (20d)': self._range.min(),
+            'Resistance (20d)': self._range.max(),
+        }
+        values['Recommendation'] = recommend(values)
+        return values
+
+
+# Scalar form of the 3-of-4 voting rule in indicators.score_recommendations
+def recommend(values, rsi_oversold=RSI_OVERSOLD, rsi_overbought=RSI_OVERBOUGHT, min_votes=MIN_VOTES):
+    rsi, macd, signal = values['RSI'], values['MACD'], values['MACD Signal']
+    close, ma50, obv_momentum = values['Current Price'], values['MA50'], values['OBV Momentum']
+
+    # int() matters: adding numpy bools is a logical OR, not a count
+    buy_score = int(rsi < rsi_oversold) + int(macd > signal) + int(close > ma50) + int(obv_momentum > 0)
+    sell_score = int(rsi > rsi_overbought) + int(macd < signal) + int(close < ma50) + int(obv_momentum < 0)
+    if buy_score >= min_votes:
+        return 'BUY'
+    if sell_score >= min_votes:
+        return 'SELL'
+    return 'HOLD'
+
+
+class StreamingPortfolio:
+    # One StreamingIndicators per symbol, seeded from cached daily histories
+    def __init__(self, histories=None):
+        self.symbols = {}
+        for symbol, history in (histories or {}).items():
+            self.seed(symbol, history)
+
+    def seed(self, symbol, history):
+        history = history.dropna(subset=['Close'])
+        self.symbols[symbol] = StreamingIndicators.from_history(history['Close'].to_numpy(), history['Volume'].to_numpy())
+
+    def on_bar(self, symbol, close, volume, new_bar=True):
+        indicators = self.symbols.setdefault(symbol, StreamingIndicators())
+        return indicators.update(close, volume, new_bar)
+
+    def snapshot(self):
+        return {symbol: indicators.values() for symbol, indicators in self.symbols.items()}
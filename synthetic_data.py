@@ -0,0 +1,154 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+
+# Series lengths used by the benchmarks: (bars, kind)
+SIZES = {
+    '250d': (250, 'daily'),
+    '5y': (1260, 'daily'),
+    '10y': (2520, 'daily'),
+    'minute': (375 * 20, 'minute'),  # 20 NSE sessions of 375 one-minute bars
+}
+
+# Where a pattern was planted: bar positions of its first and last knot
+InjectedPattern = namedtuple("InjectedPattern", ["name", "start", "end"])
+
+
+# ==================
+# PATTERN TEMPLATES
+# ==================
+# Each template is a list of (bar offset, price relative to the level where it
+# is planted) knots joined by straight lines, plus volume multipliers over
+# offset ranges. Shapes are drawn to meet the rules in chart_patterns.py with
+# some margin, so a planted pattern must be detected.
+TEMPLATES = {
+    'Head & Shoulders': {
+        'knots': [(0, 1.00), (5, 1.10), (10, 1.00), (15, 1.30), (20, 1.00), (25, 1.10), (30, 0.90), (36, 0.92)],
+        'volume': [(15, 16, 3.0)],
+    },
+    'Inverted Head & Shoulders': {
+        'knots': [(0, 1.00), (5, 0.90), (10, 1.00), (15, 0.70), (20, 1.00), (25, 0.90), (30, 1.10), (36, 1.08)],
+        'volume': [(15, 16, 3.0)],
+    },
+    'Double Top': {
+        'knots': [(0, 1.00), (10, 1.20), (20, 1.05), (30, 1.20), (40, 1.00)],
+        'volume': [],
+    },
+    'Double Bottom': {
+        'knots': [(0, 1.00), (10, 0.80), (20, 0.95), (30, 0.80), (40, 1.00)],
+        'volume': [],
+    },
+    'Triple Top': {
+        'knots': [(0, 1.00), (12, 1.20), (24, 1.05), (36, 1.20), (48, 1.05), (60, 1.20), (72, 1.00)],
+        'volume': [],
+    },
+    'Triple Bottom': {
+        'knots': [(0, 1.00), (12, 0.80), (24, 0.95), (36, 0.80), (48, 0.95), (60, 0.80), (72, 1.00)],
+        'volume': [],
+    },
+    'Cup and Handle': {
+        # Rim, 40% deep cup, recovery, then a shallow handle on light volume
+        'knots': [(0, 1.00), (15, 0.60), (30, 0.95), (35, 0.90), (41, 0.94), (46, 1.05)],
+        'volume': [(31, 41, 0.4)],
+    },
+    'Symmetrical Triangle': {
+        # Swings narrowing from +-12% to +-2%, starting with a low. Meets the
+        # swing rules; the detector's breakout check is never met (see benchmark.KNOWN_MISSES)
+        'knots': [(0, 1.00), (5, 0.88), (10, 1.12), (15, 0.91), (20, 1.09), (25, 0.94), (30, 1.06),
+                  (35, 0.96), (40, 1.04), (45, 0.98), (50, 1.02), (55, 1.00)],
+        'volume': [],
+    },
+}
+
+PATTERN_NAMES = list(TEMPLATES)
+
+
+def _template_path(template):
+    offsets, levels = zip(*template['knots'])
+    return np.interp(np.arange(offsets[-1] + 1), offsets, levels)
+
+
+def _volume_multipliers(template, length):
+    multipliers = np.ones(length)
+    for start, stop, factor in template['volume']:
+        multipliers[start:stop] = factor
+    return multipliers
+
+
+# ==================
+# GENERATOR
+# ==================
+def _index(n, kind, end):
+    if kind == 'minute':
+        sessions = pd.bdate_range(end=end, periods=-(-n // 375))
+        minutes = pd.timedelta_range(start='9h15min', periods=375, freq='min')
+        index = pd.DatetimeIndex([day + minute for day in sessions for minute in minutes])
+        return index[-n:]
+    return pd.bdate_range(end=end, periods=n)
+
+
+# Seeded OHLCV series: geometric Brownian motion with `patterns` planted at
+# evenly spaced positions (cycling through the list while they fit). Returns
+# (DataFrame with Open/High/Low/Close/Volume, [InjectedPattern]).
+def generate_ohlcv(n, kind='daily', seed=0, patterns=PATTERN_NAMES, mu=0.0002, sigma=0.015,
+                   end='2024-12-31', gap=40):
+    rng = np.random.default_rng(seed)
+    if kind == 'minute':
+        mu, sigma = mu / 375, sigma / np.sqrt(375)
+
+    returns = rng.normal(mu, sigma, n)
+    volume = rng.lognormal(mean=11, sigma=0.3, size=n)
+    relative = np.ones(n)
+
+    # Lay templates out left to right with GBM gaps between them
+    injected = []
+    position = gap
+    names = list(patterns)
+    k = 0
+    while names:
+        name = names[k % len(names)]
+        path = _template_path(TEMPLATES[name])
+        if position + len(path) + gap > n:
+            break
+        relative[position:position + len(path)] = path
+        # Flat volume profile inside the template so the volume rules can't be
+        # defeated by noise
+        segment = slice(position, position + len(path))
+        volume[segment] = volume[segment].mean() * _volume_multipliers(TEMPLATES[name], len(path))
+        returns[position + 1:position + len(path)] = 0.0
+        injected.append(InjectedPattern(name, position, position + len(path) - 1))
+        position += len(path) + gap
+        k += 1
+
+    # GBM level, frozen over each template so the shape sits on a flat base
+    level = 100 * np.exp(np.cumsum(returns))
+    close = level * relative
+    for pattern in injected:
+        # Resume the random walk from where the template ends
+        close[pattern.end + 1:] *= relative[pattern.end]
+
+    noise = np.abs(rng.normal(0, sigma / 2, n))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    high = np.maximum(open_, close) * (1 + noise)
+    low = np.minimum(open_, close) * (1 - noise)
+
+    frame = pd.DataFrame({
+        'Open': open_,
+        'High': high,
+        'Low': low,
+        'Close': close,
+        'Volume': volume.round().astype(np.int64),
+    }, index=_index(n, kind, end))
+    frame.index.name = 'Date' if kind == 'daily' else 'Datetime'
+    return frame, injected
+
+
+# A universe of `count` independently seeded symbols of the same size
+def generate_universe(count, n, kind='daily', seed=0, suffix='.NS', patterns=PATTERN_NAMES):
+    histories, injected = {}, {}
+    for i in range(count):
+        symbol = f"SYN{i:04d}{suffix}"
+        histories[symbol], injected[symbol] = generate_ohlcv(n, kind, seed=seed + i, patterns=patterns)
+    return histories, injected
@@ -0,0 +1,86 @@
+import threading
+
+from fetch_engine import FetchEngine
+from portfolio_engine import DataStore, analyze_rows
+from price_cache import PriceCache
+from result_table import STATUS_ERROR, STATUS_OK
+from synthetic_data import generate_ohlcv
+from test_market_data import StubFundamentals
+
+
+# Serves synthetic 5y daily bars, except that requests including a `failing`
+# symbol raise and requests including a `stuck` symbol hang until released
+class FlakyProvider:
+    host = "test-flaky"
+
+    def __init__(self, failing=(), stuck=()):
+        self.failing = set(failing)
+        self.stuck = set(stuck)
+        self.release = threading.Event()
+        self.requests = []
+
+    def history(self, symbols, period='5y', start=None):
+        self.requests.append(list(symbols))
+        if self.stuck & set(symbols):
+            self.release.wait(5)
+        if self.failing & set(symbols):
+            raise ConnectionError("boom")
+        return {symbol: generate_ohlcv(300, seed=i, patterns=[])[0] for i, symbol in enumerate(symbols)}
+
+    def info(self, symbol):
+        return {}
+
+
+def engine(provider, **kwargs):
+    return FetchEngine(provider, retries=0, requests_per_second=1000, burst=1000, **kwargs)
+
+
+def test_failed_chunk_is_retried_per_symbol():
+    provider = FlakyProvider(failing=['B.NS'])
+    histories = engine(provider).histories(['A.NS', 'B.NS', 'C.NS'])
+
+    assert sorted(histories) == ['A.NS', 'C.NS']
+    assert histories.errors == {'B.NS': 'boom'}
+    assert provider.requests[0] == ['A.NS', 'B.NS', 'C.NS']
+    assert sorted(provider.requests[1:]) == [['A.NS'], ['B.NS'], ['C.NS']]
+
+
+def test_stuck_symbol_times_out_alone():
+    provider = FlakyProvider(stuck=['B.NS'])
+    try:
+        histories = engine(provider, timeout=0.3).histories(['A.NS', 'B.NS', 'C.NS'])
+    finally:
+        provider.release.set()
+
+    assert sorted(histories) == ['A.NS', 'C.NS']
+    assert list(histories.errors) == ['B.NS']
+    assert histories.errors['B.NS'].startswith("Timed out")
+
+
+def test_errors_are_not_kept_between_calls():
+    provider = FlakyProvider(failing=['A.NS'])
+    fetch = engine(provider)
+    assert fetch.histories(['A.NS']).errors == {'A.NS': 'boom'}
+
+    provider.failing.clear()
+    histories = fetch.histories(['A.NS'])
+    assert list(histories) == ['A.NS']
+    assert histories.errors == {}
+
+
+def test_failed_symbol_surfaces_as_row_error(tmp_path):
+    provider = FlakyProvider(failing=['B.NS'])
+    prices = PriceCache(root=str(tmp_path), fetcher=engine(provider).histories)
+    store = DataStore(prices, StubFundamentals())
+
+    results = analyze_rows([('A', 'NSE'), ('B', 'NSE')], store)
+
+    assert results[('A', 'NSE')].row['Status'] == STATUS_OK
+    assert results[('B', 'NSE')].row['Status'] == STATUS_ERROR
+    assert results[('B', 'NSE')].row['Error'] == 'boom'
+
+    # Once the provider recovers the error is cleared
+    provider.failing.clear()
+    results = analyze_rows([('B', 'NSE')], store)
+    assert results[('B', 'NSE')].row['Status'] == STATUS_OK
+    assert prices.errors == {}
@@ -0,0 +1,54 @@
+import numpy as np
+import ta
+
+from indicators import align_panel, compute_indicators, latest_indicators
+from synthetic_data import generate_ohlcv
+
+
+# Three 1y histories with ragged listing dates and a missing session, so the
+# compacted panel layout is exercised as well as the formulas
+def synthetic_histories():
+    histories = {f"S{i}.NS": generate_ohlcv(252, seed=i, patterns=[])[0] for i in range(3)}
+    histories['S1.NS'] = histories['S1.NS'].iloc[40:]
+    histories['S2.NS'] = histories['S2.NS'].drop(histories['S2.NS'].index[100])
+    return histories
+
+
+# The same indicators computed per ticker with `ta`, the way rows used to be analyzed
+def ta_indicators(close, volume):
+    macd = ta.trend.MACD(close)
+    obv = ta.volume.OnBalanceVolumeIndicator(close, volume).on_balance_volume()
+    return {
+        'RSI': ta.momentum.RSIIndicator(close).rsi(),
+        'MACD': macd.macd(),
+        'MACD Signal': macd.macd_signal(),
+        'OBV Momentum': obv - obv.shift(5),
+        'MA50': close.rolling(window=50).mean(),
+        'MA200': close.rolling(window=200).mean(),
+    }
+
+
+def test_vectorized_indicators_match_ta():
+    histories = synthetic_histories()
+    close, volume = align_panel(histories, 'Close'), align_panel(histories, 'Volume')
+    panels = compute_indicators(close, volume)
+
+    for symbol, history in histories.items():
+        expected = ta_indicators(history['Close'].astype(float), history['Volume'].astype(float))
+        for name, series in expected.items():
+            actual = panels[name][symbol].reindex(series.index)
+            np.testing.assert_allclose(actual, series, rtol=1e-9, atol=1e-9, err_msg=f"{name} {symbol}")
+            assert panels[name][symbol].drop(series.index).isna().all()
+
+
+def test_latest_indicators_use_each_tickers_last_bar():
+    histories = synthetic_histories()
+    histories['S0.NS'] = histories['S0.NS'].iloc[:-3]
+    latest = latest_indicators(align_panel(histories, 'Close'), align_panel(histories, 'Volume'))
+
+    for symbol, history in histories.items():
+        close = history['Close'].astype(float)
+        assert latest.loc[symbol, 'Current Price'] == close.iloc[-1]
+        assert np.isclose(latest.loc[symbol, 'RSI'], ta.momentum.RSIIndicator(close).rsi().iloc[-1])
+        assert latest.loc[symbol, 'Support (20d)'] == close.iloc[-20:].min()
+        assert latest.loc[symbol, 'Resistance (20d)'] == close.iloc[-20:].max()
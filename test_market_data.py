@@ -0,0 +1,90 @@
+import pandas as pd
+
+import portfolio_engine
+from market_data import fetch_price_history, slice_period, split_download
+from pattern_scan import PATTERN_FAILED, DetectionError
+from portfolio_engine import DataStore, analyze_rows
+from price_cache import PriceCache
+from result_table import STATUS_OK
+from synthetic_data import generate_ohlcv
+
+
+# Stands in for yf.download: records every call and answers with a
+# group_by='ticker' frame of synthetic 5y daily bars for the requested symbols
+class StubDownloader:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, symbols, **kwargs):
+        self.calls.append((list(symbols), kwargs))
+        frames = {symbol: generate_ohlcv(1260, seed=i, patterns=[])[0] for i, symbol in enumerate(symbols)}
+        return pd.concat(frames, axis=1)
+
+
+class StubFundamentals:
+    def get_many(self, symbols):
+        return {symbol: {'longName': symbol, 'trailingPE': 20.0} for symbol in symbols}
+
+
+def test_fetch_price_history_requests_chunks():
+    downloader = StubDownloader()
+    symbols = [f"T{i}.NS" for i in range(120)]
+
+    histories = fetch_price_history(symbols + [None, 'T0.NS'], chunk_size=50, downloader=downloader)
+
+    assert [len(chunk) for chunk, _ in downloader.calls] == [50, 50, 20]
+    assert [s for chunk, _ in downloader.calls for s in chunk] == symbols
+    assert all(kwargs['period'] == '5y' and kwargs['group_by'] == 'ticker' for _, kwargs in downloader.calls)
+    assert sorted(histories) == sorted(symbols)
+
+
+def test_fetch_price_history_start_replaces_period():
+    downloader = StubDownloader()
+    fetch_price_history(['A.NS'], start='2024-01-01', downloader=downloader)
+
+    _, kwargs = downloader.calls[0]
+    assert kwargs['start'] == '2024-01-01'
+    assert 'period' not in kwargs
+
+
+def test_split_download_skips_missing_symbols():
+    frame = StubDownloader()(['A.NS', 'B.NS'])
+    histories = split_download(frame, ['A.NS', 'B.NS', 'C.NS'])
+
+    assert sorted(histories) == ['A.NS', 'B.NS']
+    assert list(histories['A.NS'].columns) == ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def test_one_year_window_is_sliced_from_five_year_history(tmp_path):
+    downloader = StubDownloader()
+    fetcher = lambda symbols, **kwargs: fetch_price_history(symbols, downloader=downloader, **kwargs)
+    store = DataStore(PriceCache(root=str(tmp_path), fetcher=fetcher, period='5y'), StubFundamentals())
+
+    results = analyze_rows([('A', 'NSE'), ('B', 'BSE')], store)
+
+    # One 5y request for every holding; no separate 1y download
+    assert len(downloader.calls) == 1
+    chunk, kwargs = downloader.calls[0]
+    assert chunk == ['A.NS', 'B.BO']
+    assert kwargs['period'] == '5y'
+
+    history = store.histories(['A.NS'])['A.NS']
+    window = results[('A', 'NSE')].window
+    assert results[('A', 'NSE')].row['Status'] == STATUS_OK
+    assert window.index.equals(slice_period(history, '1y').index)
+    assert window.index[0] > history.index[-1] - pd.DateOffset(years=1)
+    assert len(downloader.calls) == 1
+
+
+def test_failed_pattern_scan_keeps_row(tmp_path, monkeypatch):
+    failure = DetectionError(PATTERN_FAILED, "hold", "Pattern detection failed: boom")
+    monkeypatch.setattr(portfolio_engine, 'scan_patterns', lambda series, **kwargs: {symbol: failure for symbol in series})
+    fetcher = lambda symbols, **kwargs: fetch_price_history(symbols, downloader=StubDownloader(), **kwargs)
+    store = DataStore(PriceCache(root=str(tmp_path), fetcher=fetcher), StubFundamentals())
+
+    row = analyze_rows([('A', 'NSE')], store)[('A', 'NSE')].row
+
+    assert row['Status'] == STATUS_OK
+    assert row['Pattern'] == PATTERN_FAILED
+    assert row['Error'] == "Pattern detection failed: boom"
+    assert pd.notna(row['RSI']) and pd.notna(row['Current Price'])
@@ -0,0 +1,29 @@
+import shared_cache
+from shared_cache import SharedDataStore
+
+
+class CountingPrices:
+    holidays = ()
+
+    def __init__(self):
+        self.errors = {}
+        self.calls = []
+
+    def get_histories(self, symbols):
+        self.calls.append(list(symbols))
+        return {symbol: f"{symbol}@{len(self.calls)}" for symbol in symbols}
+
+
+def test_histories_are_kept_per_data_version(monkeypatch):
+    version = ['2026-10-16']
+    monkeypatch.setattr(shared_cache, 'data_version', lambda now=None, holidays=(): version[0])
+    prices = CountingPrices()
+    store = SharedDataStore(prices, fundamentals_cache=None)
+
+    assert store.histories(['A.NS']) == {'A.NS': 'A.NS@1'}
+    assert store.histories(['A.NS']) == {'A.NS': 'A.NS@1'}
+    assert len(prices.calls) == 1
+
+    # A new session invalidates the entry even though the TTL has not passed
+    version[0] = '2026-10-17'
+    assert store.histories(['A.NS']) == {'A.NS': 'A.NS@2'}
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from indicators import compute_indicators, latest_indicators, score_recommendations
+from streaming_indicators import StreamingIndicators
+from synthetic_data import generate_ohlcv
+
+
+def synthetic_bars(n=300):
+    history = generate_ohlcv(n, seed=7)[0]
+    return history['Close'].to_numpy(dtype=float), history['Volume'].to_numpy(dtype=float)
+
+
+def test_streaming_matches_batch_with_revised_ticks():
+    closes, volumes = synthetic_bars()
+    panels = compute_indicators(pd.DataFrame({'S': closes}), pd.DataFrame({'S': volumes}))
+
+    indicators = StreamingIndicators()
+    for i, (close, volume) in enumerate(zip(closes, volumes)):
+        # Each bar opens on a provisional tick and is revised in place twice
+        indicators.update(close * 1.01, volume * 0.5)
+        indicators.update(close * 0.99, volume * 0.7, new_bar=False)
+        values = indicators.update(close, volume, new_bar=False)
+        for name, panel in panels.items():
+            np.testing.assert_allclose(values[name], panel['S'].iloc[i], rtol=1e-9, atol=1e-9,
+                                       err_msg=f"{name} at bar {i}")
+
+
+def test_revised_last_bar_matches_replayed_history():
+    closes, volumes = synthetic_bars()
+    replayed = StreamingIndicators.from_history(closes, volumes).values()
+
+    indicators = StreamingIndicators.from_history(closes[:-1], volumes[:-1])
+    indicators.update(closes[-1] * 1.05, volumes[-1] * 3)
+    indicators.update(closes[-1] * 0.95, volumes[-1] * 2, new_bar=False)
+    revised = indicators.update(closes[-1], volumes[-1], new_bar=False)
+
+    assert revised['Recommendation'] == replayed['Recommendation']
+    for name in replayed:
+        if name != 'Recommendation':
+            np.testing.assert_allclose(revised[name], replayed[name], rtol=1e-12, err_msg=name)
+
+    latest = latest_indicators(pd.DataFrame({'S': closes}), pd.DataFrame({'S': volumes}))
+    _, _, batch = score_recommendations(
+        latest['RSI'], latest['MACD'], latest['MACD Signal'],
+        latest['Current Price'], latest['MA50'], latest['OBV Momentum'],
+    )
+    assert revised['Recommendation'] == batch['S']
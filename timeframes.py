@@ -0,0 +1,139 @@
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from indicators import align_panel, latest_indicators, score_recommendations
+from pattern_scan import NO_PATTERN, pattern_series, scan_patterns
+from profiling import profiler
+
+
+# Higher timeframes built from the cached daily series, as pandas period
+# frequencies. Weeks run Monday-Sunday so special weekend sessions stay in their week.
+TIMEFRAMES = {
+    'Weekly': 'W-SUN',
+    'Monthly': 'M',
+}
+
+AGGREGATIONS = {
+    'Open': 'first',
+    'High': 'max',
+    'Low': 'min',
+    'Close': 'last',
+    'Adj Close': 'last',
+    'Volume': 'sum',
+}
+
+# Per-timeframe columns shown next to the daily results
+TIMEFRAME_FIELDS = ['RSI', 'Pattern', 'Recommendation']
+TIMEFRAME_COLUMNS = [f"{field} ({timeframe})" for timeframe in TIMEFRAMES for field in TIMEFRAME_FIELDS]
+
+MAX_STORED_SERIES = 5000
+
+
+# ==================
+# RESAMPLING
+# ==================
+# Aggregate daily OHLCV into one bar per period. Each bar is labelled with the
+# last trading day it contains, so the latest bar may be a partial period.
+def resample_ohlcv(daily, freq):
+    daily = daily.dropna(subset=['Close'])
+    if daily.empty:
+        return daily
+    periods = _periods(daily.index, freq)
+    aggregations = {column: how for column, how in AGGREGATIONS.items() if column in daily}
+    bars = daily.groupby(periods).agg(aggregations)
+    bars.index = pd.DatetimeIndex(pd.Series(daily.index, index=periods).groupby(level=0).last(), name=daily.index.name)
+    return bars
+
+
+# Periods are taken on exchange-local dates; dropping the timezone first avoids pandas' warning
+def _periods(index, freq):
+    return (index.tz_localize(None) if index.tz is not None else index).to_period(freq)
+
+
+# Bring previously resampled bars up to date with `daily`. Only the daily rows
+# from the start of the last (possibly partial) bar onwards are re-aggregated.
+def update_bars(previous, daily, freq):
+    if previous is None or previous.empty or daily.empty:
+        return resample_ohlcv(daily, freq)
+
+    period_start = _periods(previous.index[-1:], freq)[0].start_time
+    if daily.index.tz is not None:
+        period_start = period_start.tz_localize(daily.index.tz)
+    tail = daily.iloc[daily.index.searchsorted(period_start):]
+    return pd.concat([previous.iloc[:-1], resample_ohlcv(tail, freq)])
+
+
+class BarStore:
+    # Process-wide weekly/monthly bars keyed by (symbol, timeframe). Daily
+    # histories only ever gain rows at the end (or drop old ones when the 5y
+    # window rolls), so most calls re-aggregate just the latest bar. The least
+    # recently used series are dropped beyond `max_series`.
+    def __init__(self, max_series=MAX_STORED_SERIES):
+        self.max_series = max_series
+        self._bars = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, symbol, daily, timeframe):
+        freq = TIMEFRAMES[timeframe]
+        key = (symbol, timeframe)
+        with self._lock:
+            entry = self._bars.get(key)
+
+        # A rolled-off head changes the first bar, so rebuild from scratch then
+        if entry is not None and not daily.empty and entry[0] == daily.index[0]:
+            bars = update_bars(entry[1], daily, freq)
+        else:
+            bars = resample_ohlcv(daily, freq)
+
+        with self._lock:
+            self._bars[key] = (daily.index[0] if not daily.empty else None, bars)
+            self._bars.move_to_end(key)
+            while len(self._bars) > self.max_series:
+                self._bars.popitem(last=False)
+        return bars
+
+
+def resample_histories(histories, timeframe, store=None):
+    if store is not None:
+        return {symbol: store.get(symbol, history, timeframe) for symbol, history in histories.items()}
+    freq = TIMEFRAMES[timeframe]
+    return {symbol: resample_ohlcv(history, freq) for symbol, history in histories.items()}
+
+
+# ==================
+# TIMEFRAME SIGNALS
+# ==================
+# Run the indicator pipeline and chart pattern scan on one timeframe's bars.
+# Returns a frame indexed by symbol with the TIMEFRAME_FIELDS for that timeframe.
+def timeframe_signals(bars):
+    bars = {symbol: frame for symbol, frame in bars.items() if frame is not None and not frame.empty}
+    if not bars:
+        return pd.DataFrame(columns=TIMEFRAME_FIELDS)
+
+    latest = latest_indicators(align_panel(bars, 'Close'), align_panel(bars, 'Volume'))
+    _, _, recommendations = score_recommendations(
+        latest['RSI'], latest['MACD'], latest['MACD Signal'],
+        latest['Current Price'], latest['MA50'], latest['OBV Momentum'],
+    )
+    # Weekly/monthly series are a few hundred bars at most; scanning them in
+    # process is cheaper than starting a worker pool
+    patterns = scan_patterns(pattern_series(bars), max_workers=1)
+
+    return pd.DataFrame({
+        'RSI': latest['RSI'].round(2),
+        'Pattern': [patterns.get(symbol, NO_PATTERN)[0] for symbol in latest.index],
+        'Recommendation': recommendations,
+    }, index=latest.index)
+
+
+# Daily histories -> {symbol: {column: value}} for every higher timeframe
+def higher_timeframe_rows(histories, store=None):
+    rows = {symbol: {} for symbol in histories}
+    for timeframe in TIMEFRAMES:
+        with profiler.span(f"timeframes.{timeframe}"):
+            signals = timeframe_signals(resample_histories(histories, timeframe, store))
+        for symbol, values in signals.iterrows():
+            rows[symbol].update({f"{field} ({timeframe})": values[field] for field in TIMEFRAME_FIELDS})
+    return rows